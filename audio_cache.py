@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import yt_dlp
+
+from utils import extract_video_id
+from loudness import loudness_analyzer
+
+logger = logging.getLogger(__name__)
+
+AUDIO_CACHE_DIR = "audio_cache"
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 ** 3  # Least recently played files are evicted beyond this
+AUDIO_CACHE_AHEAD = 2  # Upcoming queue items to download ahead of time
+AUDIO_CACHE_WORKERS = 1  # Downloads run one at a time so they do not starve the stream
+PARTIAL_SUFFIXES = (".part", ".ytdl", ".tmp")
+
+
+class AudioCache:
+    """On-disk cache of downloaded audio files keyed by video ID.
+
+    Files are named <video_id>.<ext> so the cache can be rebuilt from the
+    directory listing on startup; the modification time records the last play
+    and orders LRU eviction. A max_bytes of 0 disables the cache.
+    """
+
+    def __init__(
+        self,
+        directory: str = AUDIO_CACHE_DIR,
+        max_bytes: int = AUDIO_CACHE_MAX_BYTES,
+        workers: int = AUDIO_CACHE_WORKERS,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audio-cache")
+        self.files: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()  # video_id -> (path, size)
+        self.total_bytes = 0
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.load()
+
+    def configure(self, directory: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES):
+        with self.lock:
+            self.directory = directory
+            self.max_bytes = max_bytes
+        self.load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def load(self):
+        """Index the files already in the cache directory, least recently played first"""
+        with self.lock:
+            self.files.clear()
+            self.total_bytes = 0
+            if not self.enabled or not os.path.isdir(self.directory):
+                return
+            found = []
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.endswith(PARTIAL_SUFFIXES):
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime, os.path.splitext(entry.name)[0], entry.path, stat.st_size))
+            for _, video_id, path, size in sorted(found):
+                self.files[video_id] = (path, size)
+                self.total_bytes += size
+            self._evict()
+
+    def __contains__(self, video_id: str) -> bool:
+        with self.lock:
+            return video_id in self.files
+
+    def get_path(self, video_id: str) -> Optional[str]:
+        """Return the local file for video_id and mark it as just played, or None"""
+        with self.lock:
+            entry = self.files.get(video_id)
+            if entry is None:
+                return None
+            path = entry[0]
+            if not os.path.exists(path):
+                self._forget(video_id)
+                return None
+            self.files.move_to_end(video_id)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def schedule(self, video_url: str):
+        """Download the audio for video_url in the background unless it is cached"""
+        if not self.enabled:
+            return
+        video_id = extract_video_id(video_url)
+        if not video_id:
+            return
+        with self.lock:
+            entry = self.files.get(video_id)
+            if entry is None and video_id not in self.pending:
+                self.pending.add(video_id)
+                self.executor.submit(self._download, video_id, video_url)
+        if entry is not None:
+            # Files from earlier sessions may not have been measured yet
+            loudness_analyzer.schedule(video_id, entry[0])
+
+    def _download(self, video_id: str, video_url: str):
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': os.path.join(self.directory, f"{video_id}.%(ext)s"),
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(video_url, download=True)
+                path = ydl.prepare_filename(info)
+            size = os.path.getsize(path)
+            with self.lock:
+                if video_id in self.files:
+                    self.total_bytes -= self.files[video_id][1]
+                self.files[video_id] = (path, size)
+                self.total_bytes += size
+                self._evict(keep=video_id)
+            logger.info(f"Cached audio for {video_id} ({size // 1024} KiB)")
+            loudness_analyzer.schedule(video_id, path)
+        except Exception as e:
+            logger.error(f"Caching audio for {video_id} failed: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard(video_id)
+
+    def _evict(self, keep: Optional[str] = None):
+        """Delete least recently played files until the cache fits. Caller holds the lock."""
+        for video_id in list(self.files):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if video_id == keep:
+                continue
+            path = self.files[video_id][0]
+            self._forget(video_id)
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.error(f"Evicting {path} failed: {e}")
+
+    def _forget(self, video_id: str):
+        _, size = self.files.pop(video_id)
+        self.total_bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "files": len(self.files),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "downloading": len(self.pending),
+            }
+
+
+# Global audio cache instance
+audio_cache = AudioCache()
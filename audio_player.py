@@ -1,27 +1,52 @@
-import yt_dlp
 import subprocess
 import threading
 import os
+import socket
 import tempfile
-from data_models import queue_lock, music_playlist, played_history
-import datetime
+import data_models
+from data_models import queue_lock, play_next
+from prefetcher import stream_prefetcher
+from mpv_ipc import MpvIpcPlayer
+from loudness import get_gain
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+USE_MPV_IPC = True  # Keep one MPV alive over JSON IPC instead of a process per track
+NORMALIZE_LOUDNESS = True  # Apply the gain measured by loudness.py when a track starts
+
+
+def normalization_filter(video_url):
+    """MPV audio filter bringing the track to the target loudness, or "" if unmeasured"""
+    gain = get_gain(video_url) if NORMALIZE_LOUDNESS else None
+    return f"volume=volume={gain:.2f}dB" if gain is not None else ""
+
+
 class AudioPlayer:
-    def __init__(self):
+    def __init__(self, use_ipc=USE_MPV_IPC):
         self.current_process = None
+        self.mpv_process = None
         self.is_playing = False
         self.should_stop = False
         self.autoplay_enabled = False  # New autoplay flag
-    
+        self.completion_callback = None
+
+        # One long-lived MPV driven over JSON IPC where unix sockets are available
+        self.mpv = None
+        if use_ipc and hasattr(socket, "AF_UNIX"):
+            self.mpv = MpvIpcPlayer()
+            self.mpv.on_track_end = self._on_track_end
+
     def extract_and_play_audio(self, video_url, title, username, on_completion_callback=None):
         """Extract audio from YouTube URL and play it using MPV"""
         logger.info(f"Starting playback for: {title}")
-        
+
+        if self.mpv is not None:
+            self._play_with_ipc(video_url, title, on_completion_callback)
+            return
+
         # Cancel any currently playing audio
         if self.is_playing:
             self.stop_current_playback()
@@ -32,22 +57,20 @@ class AudioPlayer:
             self.should_stop = False
             
             try:
-                # Get direct audio URL using yt-dlp without downloading
-                ydl_opts = {
-                    'format': 'bestaudio/best',
-                }
-                
+                # Get direct audio URL, instantly if the prefetcher already resolved it
                 logger.info(f"Getting audio URL for: {title}")
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(video_url, download=False)
-                    audio_url = info['url']
+                audio_url = stream_prefetcher.get_audio_url(video_url)
                 
                 # Play using MPV with controls visible
                 logger.info(f"Playing with MPV: {audio_url}")
                 cmd = ['mpv', '--no-video', '--force-window=yes', '--keep-open=no', audio_url]
+                audio_filter = normalization_filter(video_url)
+                if audio_filter:
+                    cmd.insert(-1, f'--af={audio_filter}')
                 
                 # Start MPV process and capture output for debugging
                 process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                self.mpv_process = process
                 
                 # Monitor the process
                 try:
@@ -92,13 +115,80 @@ class AudioPlayer:
         # Start playback in a separate thread
         self.current_process = threading.Thread(target=playback_thread, daemon=True)
         self.current_process.start()
+
+    def _play_with_ipc(self, video_url, title, on_completion_callback):
+        """Load the track into the persistent MPV instance, replacing whatever plays"""
+        def load_thread():
+            self.should_stop = False
+            self.is_playing = True
+            try:
+                logger.info(f"Getting audio URL for: {title}")
+                audio_url = stream_prefetcher.get_audio_url(video_url)
+                # The replaced track ends with reason "stop", so its callback never fires
+                self.completion_callback = on_completion_callback
+                # The filter chain is global in MPV, so reset it for every track
+                self.mpv.set_property("af", normalization_filter(video_url))
+                self.mpv.loadfile(audio_url)
+                logger.info(f"Playing with MPV: {title}")
+            except Exception as e:
+                logger.error(f"Error in audio playback: {e}")
+                self.completion_callback = None
+                self.is_playing = False
+
+        self.current_process = threading.Thread(target=load_thread, daemon=True)
+        self.current_process.start()
+
+    def _on_track_end(self, reason):
+        """Called by the MPV IPC reader when a track finishes"""
+        if reason not in ("eof", "error") or self.should_stop:
+            # Replaced or stopped; whoever did that already set is_playing, and
+            # this may run after the next track has started
+            return
+        if self.mpv.playing:
+            # A replacement track is already loading
+            return
+        self.is_playing = False
+        if reason == "error":
+            logger.error("MPV could not play the track, skipping")
+        callback = self.completion_callback
+        self.completion_callback = None
+        if callback:
+            callback()
     
     def stop_current_playback(self):
         """Stop current audio playback"""
         logger.info("Stopping current playback")
         self.should_stop = True
         self.is_playing = False
+        self.completion_callback = None
+        try:
+            if self.mpv is not None:
+                self.mpv.stop()
+            elif self.mpv_process and self.mpv_process.poll() is None:
+                self.mpv_process.terminate()
+        except Exception as e:
+            logger.error(f"Error stopping playback: {e}")
+
+    def shutdown(self):
+        """Quit the persistent MPV instance"""
+        if self.mpv is not None:
+            self.mpv.shutdown()
+
+    def get_position(self):
+        """Elapsed seconds of the current track, if the backend reports it"""
+        return self.mpv.position if self.mpv is not None else None
+
+    def get_duration(self):
+        """Duration in seconds of the current track, if the backend reports it"""
+        return self.mpv.duration if self.mpv is not None else None
     
+    def get_remaining(self):
+        """Seconds left in the current track, 0 when nothing is playing or it is unknown"""
+        duration = self.get_duration()
+        if not self.is_playing or duration is None:
+            return 0.0
+        return max(0.0, duration - (self.get_position() or 0.0))
+
     def is_currently_playing(self):
         """Check if audio is currently playing"""
         return self.is_playing
@@ -117,6 +207,8 @@ class AudioPlayer:
 
 # Global audio player instance
 audio_player = AudioPlayer()
+# Queue wait estimates include whatever is left of the current track
+data_models.playback_remaining = audio_player.get_remaining
 
 
 def play_next_in_queue():
@@ -127,22 +219,17 @@ def play_next_in_queue():
         return
         
     with queue_lock:
-        if music_playlist:
-            # Get the next item in queue
-            next_item = music_playlist[0]
-            print(f"Auto-playing next: {next_item.title}")
+        # Move the next item from the queue to played history
+        item = play_next()
+        if item:
+            print(f"Auto-playing next: {item.title}")
             
             # Play the audio
             audio_player.extract_and_play_audio(
-                next_item.url, 
-                next_item.title, 
-                next_item.username,
+                item.url, 
+                item.title, 
+                item.username,
                 on_completion_callback=play_next_in_queue
             )
-            
-            # Move item from queue to played history
-            item = music_playlist.pop(0)
-            item.processed_at = datetime.datetime.now().strftime("%H:%M:%S")
-            played_history.append(item)
         else:
             print("Queue is empty, no more songs to play.")
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Metadata lookup cost: full BeautifulSoup parse vs the streaming scan.
+
+Serves bench/fixtures/watch_page.html in place of YouTube and reports, per
+lookup, the bytes taken from the response, CPU time and peak traced memory.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+import utils
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "watch_page.html")
+URL = "https://www.youtube.com/watch?v=R_rUYuFtNO4"
+
+
+class FixtureResponse:
+    """Stands in for a requests response, counting the bytes handed out"""
+
+    status_code = 200
+
+    def __init__(self, page: bytes):
+        self.page = page
+        self.bytes_read = 0
+
+    @property
+    def text(self):
+        self.bytes_read += len(self.page)
+        return self.page.decode("utf-8")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.page), chunk_size):
+            chunk = self.page[start:start + chunk_size]
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def measure(name, lookup, page, runs):
+    responses = []
+
+    def serve(url, **kwargs):
+        responses.append(FixtureResponse(page))
+        return responses[-1]
+
+    http_client.get = serve
+    result = lookup(URL)
+
+    started = time.process_time()
+    for _ in range(runs):
+        lookup(URL)
+    cpu_ms = (time.process_time() - started) * 1000 / runs
+
+    tracemalloc.start()
+    lookup(URL)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(
+        f"{name:<12} {responses[0].bytes_read / 1024:>10.0f} KiB {cpu_ms:>10.2f} ms "
+        f"{peak / 1024 ** 2:>10.2f} MiB   {result}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="lookups timed per implementation")
+    args = parser.parse_args()
+
+    with open(FIXTURE, "rb") as f:
+        page = f.read()
+    print(f"Fixture: {len(page) / 1024:.0f} KiB, {args.runs} runs each")
+    print(f"{'':<12} {'read':>14} {'CPU/lookup':>13} {'peak memory':>14}")
+    measure("soup", utils.fetch_youtube_metadata_full, page, args.runs)
+    measure("fast", utils.fetch_youtube_metadata_fast, page, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Memory held by a night of history: 100k queue items before and after slotting.
+
+"before" is QueueItem as it was: a plain dataclass with "%H:%M:%S" strings
+and no stored video ID. Names and addresses arrive as fresh strings per
+request, as they do from the web form, so interning has something to share.
+"""
+import argparse
+import datetime
+import gc
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_models import QueueItem
+
+GUESTS = 40
+VIDEOS = 2000
+
+_ids = itertools.count(1)
+
+
+@dataclass
+class PlainQueueItem:
+    url: str
+    title: str
+    ip: str
+    username: str
+    added_at: str
+    processed_at: Optional[str] = None
+    id: int = field(default_factory=lambda: next(_ids))
+    status: str = "ready"
+    duration: Optional[float] = None
+
+
+def submission(i):
+    guest = i % GUESTS
+    # Built per request, like request.form and remote_addr values
+    return (
+        f"https://www.youtube.com/watch?v=vid{i % VIDEOS:08d}",
+        f"Artist {i % VIDEOS} - Song {i % VIDEOS}",
+        ".".join(("192", "168", "1", str(guest))),
+        "".join(("guest", str(guest))),
+    )
+
+
+def build_before(count):
+    now = time.time()
+    items = []
+    for i in range(count):
+        url, title, ip, username = submission(i)
+        items.append(PlainQueueItem(
+            url=url, title=title, ip=ip, username=username,
+            added_at=datetime.datetime.fromtimestamp(now + i).strftime("%H:%M:%S"),
+            processed_at=datetime.datetime.fromtimestamp(now + i + 60).strftime("%H:%M:%S"),
+            duration=200.0,
+        ))
+    return items
+
+
+def build_after(count):
+    now = time.time()
+    items = []
+    for i in range(count):
+        url, title, ip, username = submission(i)
+        items.append(QueueItem(
+            url=url, title=title, ip=ip, username=username,
+            added_at=now + i, processed_at=now + i + 60, duration=200.0,
+        ))
+    return items
+
+
+def measure(name, build, count):
+    gc.collect()
+    tracemalloc.start()
+    items = build(count)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name:<7} {held / 1024 ** 2:>7.1f} MiB  {held / count:>6.0f} B/item")
+    del items
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{args.items} items, {GUESTS} guests, {VIDEOS} distinct videos")
+    before = measure("before", build_before, args.items)
+    after = measure("after", build_after, args.items)
+    print(f"after holds {100 * (1 - after / before):.0f}% less, including the cached video ID")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""URL parsing cost over bench/fixtures/youtube_urls.txt.
+
+Each URL is validated and has its video ID extracted, as a submission does.
+Compares the regexes utils.py used to repeat inline against parse_youtube_url,
+uncached and memoized. The corpus is replayed several times, since the same
+links come back over and over.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_url import parse_youtube_url
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "youtube_urls.txt")
+
+
+def inline_regex(url):
+    """is_valid_youtube_url and extract_video_id as they were"""
+    youtube_regex = (
+        r"(https?://)?(www\.)?"
+        r"(youtube|youtu|youtube-nocookie)\.(com|be)/"
+        r"(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})"
+    )
+    if re.match(youtube_regex, url) is None:
+        return None
+    match = re.match(youtube_regex, url)
+    return match.group(6) if match else None
+
+
+def unified(parse):
+    def lookup(url):
+        parsed = parse(url)
+        if parsed is None or parsed.video_id is None:
+            return None
+        return parsed.video_id
+    return lookup
+
+
+def measure(name, lookup, urls, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for url in urls:
+            lookup(url)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<10} {elapsed * 1e9 / (rounds * len(urls)):>8.0f} ns/URL")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20, help="passes over the corpus")
+    args = parser.parse_args()
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip()]
+    print(f"{len(urls)} URLs ({len(set(urls))} distinct), {args.rounds} rounds")
+
+    inline = inline_regex
+    uncached = unified(parse_youtube_url.__wrapped__)
+    memoized = unified(parse_youtube_url)
+    differ = [url for url in urls if inline(url) != uncached(url)]
+    print(f"{len(set(differ))} distinct URLs parse differently, e.g. {sorted(set(differ))[:3]}")
+
+    measure("inline", inline, urls, args.rounds)
+    measure("uncached", uncached, urls, args.rounds)
+    parse_youtube_url.cache_clear()
+    measure("memoized", memoized, urls, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Server load from open guest pages: polling vs the /api/events push channel.
+
+Starts the app under waitress in-process, opens --clients simulated pages and
+changes the queue every few seconds, once with pages that poll (/api/current
+every 2 s and /api/queue_data every 5 s, as the player page did and the
+fallback still does) and once with pages that hold an event stream and only
+refetch the queue when told to. Prints the requests the server handled.
+"""
+import argparse
+import http.client
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_models
+import flask_app
+from data_models import QueueItem
+
+NOW_PLAYING_POLL = 2.0
+QUEUE_POLL = 5.0
+QUEUE_REFRESH = 30.0  # The page's wait-estimate refresh, kept with push
+EVENT_COALESCE = 0.25
+
+requests_seen = Counter()
+requests_lock = threading.Lock()
+
+
+def counting(app):
+    def wsgi(environ, start_response):
+        with requests_lock:
+            requests_seen[environ["PATH_INFO"]] += 1
+        return app(environ, start_response)
+    return wsgi
+
+
+def get(conn, path):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def polling_page(port, stop):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    now = time.monotonic()
+    due = {"/api/current": now + random.uniform(0, NOW_PLAYING_POLL), "/api/queue_data": now + random.uniform(0, QUEUE_POLL)}
+    while not stop.is_set():
+        path = min(due, key=due.get)
+        if stop.wait(max(0.0, due[path] - time.monotonic())):
+            break
+        get(conn, path)
+        due[path] += NOW_PLAYING_POLL if path == "/api/current" else QUEUE_POLL
+    conn.close()
+
+
+def push_page(port, stop, streams):
+    stream = http.client.HTTPConnection("127.0.0.1", port, timeout=None)
+    stream.request("GET", "/api/events")
+    response = stream.getresponse()
+    if response.status != 200:
+        raise RuntimeError(f"/api/events answered {response.status}; raise --threads")
+    streams.append(stream)
+    changed = threading.Event()
+
+    def listen():
+        try:
+            for line in response:
+                if line.startswith(b"event: queue") or line.startswith(b"event: reset"):
+                    changed.set()
+        except (OSError, ValueError):
+            pass
+
+    threading.Thread(target=listen, daemon=True).start()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    get(conn, "/api/queue_data")
+    next_refresh = time.monotonic() + QUEUE_REFRESH
+    while not stop.is_set():
+        if changed.wait(min(1.0, max(0.0, next_refresh - time.monotonic()))):
+            stop.wait(EVENT_COALESCE)
+            changed.clear()
+        elif time.monotonic() < next_refresh:
+            continue
+        get(conn, "/api/queue_data")
+        next_refresh = time.monotonic() + QUEUE_REFRESH
+    conn.close()
+
+
+def change_queue(stop, every):
+    n = 0
+    while not stop.wait(every):
+        n += 1
+        data_models.add_item(QueueItem(
+            url=f"https://youtu.be/load{n:07d}", title=f"Song {n}", ip="10.0.0.1", username="load", duration=200,
+        ))
+        if len(data_models.music_playlist) > 5:
+            data_models.play_next()
+
+
+def run(mode, args):
+    server = flask_app.make_server(
+        host="127.0.0.1", port=0, threads=args.threads, connection_limit=4 * args.clients,
+    )
+
+    def serve():
+        try:
+            server.run()
+        except OSError:
+            pass
+
+    threading.Thread(target=serve, daemon=True).start()
+    requests_seen.clear()
+    stop = threading.Event()
+    streams = []
+    page = polling_page if mode == "poll" else lambda port, stop: push_page(port, stop, streams)
+    pages = [threading.Thread(target=page, args=(server.effective_port, stop), daemon=True) for _ in range(args.clients)]
+    for thread in pages:
+        thread.start()
+    threading.Thread(target=change_queue, args=(stop, args.change_every), daemon=True).start()
+
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in pages:
+        thread.join(timeout=5)
+    for stream in streams:
+        stream.close()
+    server.close()
+
+    handled = sum(requests_seen.values())
+    detail = ", ".join(f"{path} {count}" for path, count in sorted(requests_seen.items()))
+    print(f"{mode:<5} {handled:>6} requests  {handled / args.seconds:>7.1f}/s  ({detail})")
+    return handled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=30.0, help="length of each run")
+    parser.add_argument("--change-every", type=float, default=4.0, help="seconds between queue changes")
+    parser.add_argument("--threads", type=int, default=flask_app.SERVER_THREADS, help="server threads; streams may use half")
+    args = parser.parse_args()
+
+    flask_app.flask_app.wsgi_app = counting(flask_app.flask_app.wsgi_app)
+    print(f"{args.clients} pages for {args.seconds:.0f} s, queue change every {args.change_every:.0f} s")
+    polled = run("poll", args)
+    pushed = run("push", args)
+    print(f"Push handles {100 * (1 - pushed / polled):.0f}% fewer requests")
+
+
+if __name__ == "__main__":
+    main()
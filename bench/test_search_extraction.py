@@ -0,0 +1,65 @@
+"""Search result extraction: BeautifulSoup + full json.loads vs the ytInitialData subtree decode.
+
+Run with pytest-benchmark installed: python -m pytest bench/test_search_extraction.py
+"""
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from yt_initial_data import parse_search_page
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search_page.html")
+
+
+@pytest.fixture(scope="module")
+def page():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+def soup_search_results(page):
+    """The extraction perform_youtube_search used before yt_initial_data"""
+    soup = BeautifulSoup(page, "html.parser")
+    yt_initial_data = None
+    for script in soup.find_all("script"):
+        if "var ytInitialData" in str(script):
+            yt_initial_data = script
+            break
+    json_str = str(yt_initial_data).split("var ytInitialData = ")[1].split(";</script>")[0]
+    data = json.loads(json_str)
+    contents = (
+        data.get("contents", {}).get("twoColumnSearchResultsRenderer", {})
+        .get("primaryContents", {}).get("sectionListRenderer", {}).get("contents", [])
+    )
+    results = []
+    for section in contents:
+        for item in section.get("itemSectionRenderer", {}).get("contents", []):
+            if "videoRenderer" not in item:
+                continue
+            video = item["videoRenderer"]
+            results.append({
+                "title": video.get("title", {}).get("runs", [{}])[0].get("text"),
+                "channel": video.get("ownerText", {}).get("runs", [{}])[0].get("text"),
+                "url": f"https://www.youtube.com/watch?v={video.get('videoId')}",
+                "thumbnail": video.get("thumbnail", {}).get("thumbnails", [{}])[-1].get("url"),
+            })
+    return results
+
+
+def test_soup_extraction(benchmark, page):
+    results = benchmark(soup_search_results, page)
+    assert len(results) == 20
+
+
+def test_subtree_extraction(benchmark, page):
+    results, continuation = benchmark(parse_search_page, page)
+    assert results == soup_search_results(page)
+    assert continuation
@@ -1,24 +1,565 @@
+import datetime
+import itertools
+import sys
 import threading
-from dataclasses import dataclass
-from typing import List, Optional
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from order_tree import OrderTree, TreeNode
+from utils import extract_video_id
+
+# Monotonic source of stable per-item IDs
+_item_ids = itertools.count(1)
+
+
+TIME_FORMAT = "%H:%M:%S"
+
+
+def format_time(timestamp: Optional[float]) -> Optional[str]:
+    """Local wall-clock time of an epoch timestamp, for display"""
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp).strftime(TIME_FORMAT)
+
 
 # --- Data Structure ---
-@dataclass
+# Slotted to keep long histories small. Timestamps are epoch seconds and are
+# only formatted for display; username and IP are interned because a night
+# of history repeats the same few guests, and the video ID is parsed once.
+@dataclass(slots=True)
 class QueueItem:
     url: str
     title: str
     ip: str
     username: str
-    added_at: str
-    processed_at: Optional[str] = None
+    added_at: float = field(default_factory=time.time)
+    processed_at: Optional[float] = None
+    id: int = field(default_factory=lambda: next(_item_ids))
+    status: str = "ready"  # "pending" while the title resolves, "failed" if it could not
+    duration: Optional[float] = None  # Seconds, once known
+    video_id: Optional[str] = None
+
+    def __post_init__(self):
+        self.ip = sys.intern(self.ip)
+        self.username = sys.intern(self.username)
+        if self.video_id is None:
+            self.video_id = extract_video_id(self.url)
+
+    @property
+    def added_time(self) -> str:
+        return format_time(self.added_at)
+
+    @property
+    def processed_time(self) -> Optional[str]:
+        return format_time(self.processed_at)
+
+
+@dataclass
+class StateEvent:
+    version: int
+    kind: str  # "add", "play", "reject", "reorder", "remove" or "update"
+    item_id: int
+    data: dict
+
+
+class PlaylistQueue:
+    """Queue of QueueItems kept in an OrderTree, with an index by item ID.
+
+    Each item's node weighs its duration, so an item's position and the
+    playing time ahead of it are read off the tree. Insertion in front of
+    another item, removal, moves and duration changes are O(log n)
+    expected; head pop and append are as well, and walking the queue in
+    order is O(n). Callers should address items by ID. Every method takes
+    the shared queue_lock.
+    """
+
+    def __init__(self, lock, default_duration: float):
+        self.lock = lock
+        self.default_duration = default_duration  # Seconds assumed until a duration is known
+        self.tree = OrderTree()
+        self.index: Dict[int, TreeNode] = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __bool__(self) -> bool:
+        return bool(self.index)
+
+    def __iter__(self) -> Iterator[QueueItem]:
+        return iter(self.snapshot())
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self.index
+
+    def __getitem__(self, key):
+        with self.lock:
+            if isinstance(key, slice):
+                return self.snapshot()[key]
+            if key < 0:
+                key += len(self.index)
+            if not 0 <= key < len(self.index):
+                raise IndexError("queue index out of range")
+            return self.tree.at(key).value
+
+    def snapshot(self) -> List[QueueItem]:
+        """Return the items in queue order as a plain list"""
+        with self.lock:
+            return [node.value for node in self.tree]
+
+    def peek(self, count: int) -> List[QueueItem]:
+        """Return the first count items without walking the rest of the queue"""
+        with self.lock:
+            return [node.value for node in itertools.islice(self.tree, count)]
+
+    def get(self, item_id: int) -> Optional[QueueItem]:
+        with self.lock:
+            node = self.index.get(item_id)
+            return node.value if node else None
 
+    def position(self, item_id: int) -> Optional[int]:
+        """Zero-based position of an item in the queue, or None if it is not queued"""
+        with self.lock:
+            node = self.index.get(item_id)
+            return None if node is None else self.tree.rank(node)[0]
+
+    def seconds_before(self, item_id: int) -> Optional[float]:
+        """Playing time of the items queued ahead of an item, or None if it is not queued"""
+        with self.lock:
+            node = self.index.get(item_id)
+            return None if node is None else self.tree.rank(node)[1]
+
+    def snapshot_with_waits(self) -> Tuple[List[QueueItem], List[float]]:
+        """The queue in order with the playing time ahead of each item, in one pass"""
+        with self.lock:
+            items, waits = [], []
+            ahead = 0.0
+            for node in self.tree:
+                items.append(node.value)
+                waits.append(ahead)
+                ahead += node.weight
+            return items, waits
+
+    def set_duration(self, item_id: int, seconds: Optional[float]):
+        with self.lock:
+            node = self.index.get(item_id)
+            if node is not None:
+                self.tree.set_weight(node, seconds or self.default_duration)
+
+    def append(self, item: QueueItem):
+        self.insert(item, None)
+
+    def insert(self, item: QueueItem, before_id: Optional[int] = None):
+        """Queue an item in front of before_id, or at the end when before_id is None or not queued"""
+        with self.lock:
+            node = TreeNode(item, item.duration or self.default_duration)
+            self.index[item.id] = node
+            self.tree.insert_before(node, self.index.get(before_id) if before_id is not None else None)
+
+    def popleft(self) -> Optional[QueueItem]:
+        """Remove and return the head of the queue, or None if it is empty"""
+        with self.lock:
+            if self.tree.head is None:
+                return None
+            return self.remove(self.tree.head.value.id)
+
+    def remove(self, item_id: int) -> Optional[QueueItem]:
+        """Remove an item by ID and return it, or None if it is not queued"""
+        with self.lock:
+            node = self.index.pop(item_id, None)
+            if node is None:
+                return None
+            self.tree.remove(node)
+            return node.value
+
+    def move(self, item_id: int, before_id: Optional[int] = None) -> bool:
+        """Move an item in front of before_id, or to the end when before_id is None"""
+        with self.lock:
+            node = self.index.get(item_id)
+            if node is None or item_id == before_id:
+                return False
+            before = None
+            if before_id is not None:
+                before = self.index.get(before_id)
+                if before is None:
+                    return False
+            self.tree.remove(node)
+            self.tree.insert_before(node, before)
+            return True
+
+    def move_up(self, item_id: int) -> bool:
+        """Swap an item with the one in front of it"""
+        with self.lock:
+            node = self.index.get(item_id)
+            if node is None or node.prev is None:
+                return False
+            return self.move(item_id, node.prev.value.id)
+
+    def move_down(self, item_id: int) -> bool:
+        """Swap an item with the one behind it"""
+        with self.lock:
+            node = self.index.get(item_id)
+            if node is None or node.next is None:
+                return False
+            after = node.next.next
+            return self.move(item_id, after.value.id if after else None)
+
+
+AVERAGE_SONG_DURATION_MIN = 4  # Assumed for songs whose duration is not known yet
 
 # Shared State protected by a lock
 queue_lock = threading.RLock()
-music_playlist: List[QueueItem] = []
+music_playlist = PlaylistQueue(queue_lock, AVERAGE_SONG_DURATION_MIN * 60)
 played_history: List[QueueItem] = []
 rejected_history: List[QueueItem] = []
 current_video_id: Optional[str] = None
+now_playing: Optional[QueueItem] = None
 player_opened: bool = False
 
-AVERAGE_SONG_DURATION_MIN = 4
+# Seconds left of the track that is playing; the audio player installs its own
+playback_remaining: Callable[[], float] = lambda: 0.0
+
+HISTORY_LISTS = {"played": played_history, "rejected": rejected_history}
+HISTORY_PAGE_SIZE = 50
+STATS_LIMIT = 10
+
+# Optional scheduler deciding where new submissions go (see fair_scheduler).
+# Without one the queue is plain FIFO.
+queue_scheduler = None
+
+# Optional indexed store for history queries (see history_store.HistoryStore).
+# When it is not attached, queries fall back to the in-memory lists.
+history_backend = None
+
+
+def history_page(
+    kind: str,
+    limit: int = HISTORY_PAGE_SIZE,
+    after: Optional[int] = None,
+    newer_than: Optional[int] = None,
+) -> Tuple[List[Tuple[int, QueueItem]], Optional[int], int]:
+    """Return one page of the "played" or "rejected" history, newest first.
+
+    Items are numbered by seq, their 1-based position in the list, which never
+    changes because histories only grow. after returns items older than that
+    seq; newer_than limits the page to items newer than that seq. Returns the
+    (seq, item) pairs, the cursor for the next older page (or None) and the
+    total length.
+    """
+    if history_backend is not None:
+        return history_backend.page(kind, limit, after, newer_than)
+    with queue_lock:
+        history = HISTORY_LISTS[kind]
+        total = len(history)
+        end = total if after is None else max(0, min(after - 1, total))
+        start = max(0, end - limit)
+        if newer_than is not None:
+            start = max(start, min(newer_than, end))
+        page = list(zip(range(end, start, -1), reversed(history[start:end])))
+    next_cursor = start + 1 if start > 0 else None
+    return page, next_cursor, total
+
+
+def history_items(kind: str) -> List[QueueItem]:
+    """The whole "played" or "rejected" history, oldest first"""
+    if history_backend is not None:
+        return history_backend.items(kind)
+    with queue_lock:
+        return list(HISTORY_LISTS[kind])
+
+
+def top_requesters(limit: int = STATS_LIMIT, kind: str = "played") -> List[dict]:
+    """Usernames with the most songs in a history"""
+    if history_backend is not None:
+        return history_backend.top_requesters(limit, kind)
+    with queue_lock:
+        counts = Counter(item.username for item in HISTORY_LISTS[kind])
+    ranked = sorted(counts.items(), key=lambda entry: (-entry[1], entry[0]))[:limit]
+    return [{"username": username, "songs": songs} for username, songs in ranked]
+
+
+def most_played(limit: int = STATS_LIMIT) -> List[dict]:
+    """Videos played most often, with the title they were last played under"""
+    if history_backend is not None:
+        return history_backend.most_played(limit)
+    counts = Counter()
+    latest = {}
+    with queue_lock:
+        for seq, item in enumerate(played_history):
+            video_id = item.video_id
+            if video_id:
+                counts[video_id] += 1
+                latest[video_id] = (seq, item)
+    # Ties go to the most recently played video
+    ranked = sorted(counts, key=lambda video_id: (-counts[video_id], -latest[video_id][0]))[:limit]
+    return [
+        {"video_id": video_id, "title": latest[video_id][1].title, "url": latest[video_id][1].url, "plays": counts[video_id]}
+        for video_id in ranked
+    ]
+
+
+# --- Change Feed ---
+# Every mutation bumps state_version and appends a StateEvent, so readers can
+# skip work when nothing changed and otherwise apply only the deltas.
+EVENT_LOG_SIZE = 1000
+state_version = 0
+event_log: Deque[StateEvent] = deque(maxlen=EVENT_LOG_SIZE)
+state_changed = threading.Condition(queue_lock)
+# Called with every event and its item while queue_lock is held, so listeners
+# must not block
+event_listeners: List[Callable[[StateEvent, QueueItem], None]] = []
+
+
+def record_event(kind: str, item: QueueItem, **data) -> StateEvent:
+    """Bump the state version and log a change. Caller must hold queue_lock."""
+    global state_version
+    state_version += 1
+    event = StateEvent(state_version, kind, item.id, data)
+    event_log.append(event)
+    for listener in event_listeners:
+        listener(event, item)
+    state_changed.notify_all()
+    return event
+
+
+def changes_since(version: int) -> Tuple[int, Optional[List[StateEvent]]]:
+    """Return the current version and the events after version.
+
+    The event list is None when version is older than the retained log, in
+    which case the reader has to rebuild from a full snapshot.
+    """
+    with queue_lock:
+        if version >= state_version:
+            return state_version, []
+        if not event_log or event_log[0].version > version + 1:
+            return state_version, None
+        # Events are contiguous, so the start offset follows from the versions
+        start = version + 1 - event_log[0].version
+        return state_version, list(itertools.islice(event_log, start, None))
+
+
+def wait_for_change(version: int, timeout: Optional[float] = None) -> int:
+    """Block until the state version moves past version or timeout expires"""
+    with state_changed:
+        state_changed.wait_for(lambda: state_version != version, timeout=timeout)
+        return state_version
+
+
+# --- Duplicate Detection ---
+# Submissions are matched on video ID, so youtu.be, watch?v=...&t=... and
+# embed/ links to the same song are the same song. queued_videos indexes the
+# queue and recent_videos the last REPLAY_WINDOW plays, so a check is O(1).
+DUPLICATE_POLICIES = ("reject", "merge", "allow")
+DUPLICATE_POLICY = "reject"  # "merge" points the guest at the queued copy instead
+REPLAY_WINDOW = 20  # Plays a song has to wait out before it can be queued again; 0 disables
+
+queued_videos: Dict[str, Dict[int, QueueItem]] = {}  # video_id -> queued items, oldest first
+recent_videos: Deque[str] = deque()
+recent_counts: Counter = Counter()
+recent_items: Dict[str, QueueItem] = {}  # video_id -> its latest play inside the window
+
+
+def _index_queued(item: QueueItem):
+    video_id = item.video_id
+    if video_id:
+        queued_videos.setdefault(video_id, {})[item.id] = item
+
+
+def _unindex_queued(item: QueueItem):
+    video_id = item.video_id
+    copies = queued_videos.get(video_id)
+    if copies is not None:
+        copies.pop(item.id, None)
+        if not copies:
+            del queued_videos[video_id]
+
+
+def _index_played(item: QueueItem):
+    video_id = item.video_id
+    if not video_id or REPLAY_WINDOW <= 0:
+        return
+    recent_videos.append(video_id)
+    recent_counts[video_id] += 1
+    recent_items[video_id] = item
+    if len(recent_videos) > REPLAY_WINDOW:
+        expired = recent_videos.popleft()
+        recent_counts[expired] -= 1
+        if not recent_counts[expired]:
+            del recent_counts[expired]
+            del recent_items[expired]
+
+
+def reindex_videos():
+    """Rebuild the duplicate indexes from the queue and played history"""
+    with queue_lock:
+        queued_videos.clear()
+        recent_videos.clear()
+        recent_counts.clear()
+        recent_items.clear()
+        for item in music_playlist.snapshot():
+            _index_queued(item)
+        for item in played_history[-REPLAY_WINDOW:] if REPLAY_WINDOW > 0 else []:
+            _index_played(item)
+
+
+def configure_duplicates(policy: str = DUPLICATE_POLICY, replay_window: int = REPLAY_WINDOW):
+    global DUPLICATE_POLICY, REPLAY_WINDOW
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy: {policy}")
+    DUPLICATE_POLICY = policy
+    REPLAY_WINDOW = replay_window
+    reindex_videos()
+
+
+def find_duplicate(video_id: Optional[str]) -> Tuple[Optional[str], Optional[QueueItem]]:
+    """Return ("queued", item) or ("played", item) if the video is already around"""
+    if not video_id:
+        return None, None
+    with queue_lock:
+        copies = queued_videos.get(video_id)
+        if copies:
+            return "queued", next(iter(copies.values()))
+        if video_id in recent_counts:
+            return "played", recent_items[video_id]
+    return None, None
+
+
+def submit_item(item: QueueItem) -> Tuple[str, QueueItem]:
+    """Queue item unless DUPLICATE_POLICY says otherwise.
+
+    Returns ("added", item), ("merged", queued_copy), or ("queued", copy) /
+    ("played", copy) when the submission is rejected as a duplicate.
+    Recent plays cannot be merged into, so they are always rejected.
+    """
+    with queue_lock:
+        where, existing = find_duplicate(item.video_id) if DUPLICATE_POLICY != "allow" else (None, None)
+        if where is None:
+            return "added", add_item(item)
+        if where == "queued" and DUPLICATE_POLICY == "merge":
+            return "merged", existing
+        return where, existing
+
+
+def submit_items(items: List[QueueItem]) -> List[Tuple[str, QueueItem]]:
+    """submit_item for a batch, under one lock acquisition.
+
+    The batch lands as a block: no other submission can interleave, and the
+    duplicate check also catches repeats within the batch.
+    """
+    with queue_lock:
+        return [submit_item(item) for item in items]
+
+
+def estimated_wait(item_id: int) -> Optional[float]:
+    """Seconds until a queued item starts: the rest of this track plus the ones ahead"""
+    ahead = music_playlist.seconds_before(item_id)
+    if ahead is None:
+        return None
+    return ahead + playback_remaining()
+
+
+def queue_with_waits() -> Tuple[List[QueueItem], List[float]]:
+    """Snapshot of the queue with the seconds until each item starts"""
+    items, waits = music_playlist.snapshot_with_waits()
+    remaining = playback_remaining()
+    return items, [ahead + remaining for ahead in waits]
+
+
+def add_item(item: QueueItem) -> QueueItem:
+    """Queue an item at the end, or where the queue_scheduler places it"""
+    with queue_lock:
+        before_id = queue_scheduler.place(item) if queue_scheduler is not None else None
+        music_playlist.insert(item, before_id)
+        _index_queued(item)
+        record_event("add", item, before_id=before_id, **asdict(item))
+    return item
+
+
+def update_item(item: QueueItem, **fields) -> QueueItem:
+    """Change fields of an item, e.g. once its title is resolved.
+
+    The item may already have moved to a history list; the change is applied
+    and announced either way.
+    """
+    with queue_lock:
+        for name, value in fields.items():
+            setattr(item, name, value)
+        if "duration" in fields:
+            music_playlist.set_duration(item.id, item.duration)
+        record_event("update", item, **fields)
+    return item
+
+
+def play_item(item_id: int) -> Optional[QueueItem]:
+    """Move a queued item to played history and mark it as now playing"""
+    global current_video_id, now_playing
+    with queue_lock:
+        item = music_playlist.remove(item_id)
+        if item is None:
+            return None
+        _unindex_queued(item)
+        item.processed_at = time.time()
+        played_history.append(item)
+        _index_played(item)
+        video_id = item.video_id
+        if video_id:
+            current_video_id = video_id
+            now_playing = item
+        record_event("play", item, processed_at=item.processed_at, video_id=video_id)
+    return item
+
+
+def play_next() -> Optional[QueueItem]:
+    """Move the head of the queue to played history"""
+    with queue_lock:
+        head = music_playlist.peek(1)
+        if not head:
+            return None
+        return play_item(head[0].id)
+
+
+def reject_item(item_id: int) -> Optional[QueueItem]:
+    with queue_lock:
+        item = music_playlist.remove(item_id)
+        if item is None:
+            return None
+        _unindex_queued(item)
+        item.processed_at = time.time()
+        rejected_history.append(item)
+        record_event("reject", item, processed_at=item.processed_at)
+    return item
+
+
+def remove_item(item_id: int) -> Optional[QueueItem]:
+    """Drop an item from the queue without recording it in any history"""
+    with queue_lock:
+        item = music_playlist.remove(item_id)
+        if item is not None:
+            _unindex_queued(item)
+            record_event("remove", item)
+    return item
+
+
+def move_item(item_id: int, before_id: Optional[int] = None) -> bool:
+    with queue_lock:
+        moved = music_playlist.move(item_id, before_id)
+        if moved:
+            record_event("reorder", music_playlist.get(item_id), before_id=before_id)
+    return moved
+
+
+def move_item_up(item_id: int) -> bool:
+    with queue_lock:
+        moved = music_playlist.move_up(item_id)
+        if moved:
+            record_event("reorder", music_playlist.get(item_id), direction="up")
+    return moved
+
+
+def move_item_down(item_id: int) -> bool:
+    with queue_lock:
+        moved = music_playlist.move_down(item_id)
+        if moved:
+            record_event("reorder", music_playlist.get(item_id), direction="down")
+    return moved
@@ -0,0 +1,78 @@
+from typing import Dict, Optional
+
+import data_models
+from data_models import QueueItem, StateEvent, queue_lock, music_playlist
+from order_tree import OrderTree, TreeNode
+
+
+def submitter_of(item: QueueItem) -> str:
+    """Songs are shared out per device; names are too easy to change"""
+    return item.ip or item.username
+
+
+class FairShareScheduler:
+    """Orders the queue round-robin across submitters (start-time fair queuing).
+
+    Each new item gets a tag one past the later of its submitter's previous
+    tag and the tag of the song last played, and is placed in front of the
+    first queued item with a larger tag. Queued tags are kept sorted in an
+    OrderTree, so finding that item and dropping a played one are O(log n)
+    expected, and the queue inserts the item straight into place. A guest who floods thirty songs therefore gets one song per
+    round, and the queue shown to everyone, its wait estimates and
+    play_next_in_queue (which plays the head) all follow the fair order.
+    """
+
+    def __init__(self):
+        self.virtual_time = 0
+        self.last_tags: Dict[str, int] = {}  # submitter -> tag of their latest song
+        self.nodes: Dict[int, TreeNode] = {}  # item ID -> its (tag, item ID) node, for queued items
+        self.order = OrderTree()  # (tag, item ID) of queued items, sorted
+
+    def attach(self):
+        """Start placing new submissions. Call after the journal has been recovered."""
+        with queue_lock:
+            self.rebuild()
+            data_models.queue_scheduler = self
+            data_models.event_listeners.append(self._on_event)
+
+    def rebuild(self):
+        """Tag the current queue, keeping its order, as if it had been built fairly"""
+        with queue_lock:
+            self.last_tags.clear()
+            self.nodes.clear()
+            self.order.clear()
+            for item in music_playlist.snapshot():
+                self._tag(item)
+
+    def _tag(self, item: QueueItem) -> Optional[TreeNode]:
+        """Tag an item and file it among the queued tags, returning the node it went in front of"""
+        submitter = submitter_of(item)
+        tag = max(self.last_tags.get(submitter, 0), self.virtual_time) + 1
+        self.last_tags[submitter] = tag
+        key = (tag, item.id)
+        after = self.order.first_where(lambda queued: queued > key)
+        node = self.nodes[item.id] = TreeNode(key)
+        self.order.insert_before(node, after)
+        return after
+
+    def place(self, item: QueueItem) -> Optional[int]:
+        """Tag an item about to be queued and return the ID to insert it in front of, if any.
+
+        Called by data_models.add_item with queue_lock held.
+        """
+        after = self._tag(item)
+        return after.value[1] if after else None
+
+    def _on_event(self, event: StateEvent, item: QueueItem):
+        if event.kind not in ("play", "reject", "remove"):
+            return
+        node = self.nodes.pop(item.id, None)
+        if node is None:
+            return
+        self.order.remove(node)
+        if event.kind == "play":
+            self.virtual_time = max(self.virtual_time, node.value[0])
+
+
+# Global scheduler, attached when --scheduler fair is given
+fair_scheduler = FairShareScheduler()
@@ -1,32 +1,49 @@
 import threading
 import socket
-import datetime
 from zeroconf import ServiceInfo, Zeroconf
 from flask import (
     Flask,
     request,
-    render_template_string,
+    render_template,
     flash,
     redirect,
     url_for,
     jsonify,
+    Response,
 )
+from werkzeug.exceptions import RequestEntityTooLarge
+import json
+import math
 
 from data_models import (
     queue_lock,
     music_playlist,
     played_history,
     rejected_history,
-    current_video_id,
-    AVERAGE_SONG_DURATION_MIN,
     QueueItem,
+    submit_item,
+    estimated_wait,
+    queue_with_waits,
+    changes_since,
+    wait_for_change,
+    history_page,
+    history_items,
+    top_requesters,
+    most_played,
+    HISTORY_PAGE_SIZE,
+    STATS_LIMIT,
 )
+import data_models
 from utils import (
     is_valid_youtube_url,
-    get_youtube_title,
-    extract_video_id,
-    perform_youtube_search,
+    format_wait,
 )
+from title_resolver import title_resolver
+from prefetcher import stream_prefetcher
+from audio_cache import audio_cache
+from search_cache import youtube_search_cache
+from playlist_import import playlist_importer
+from rate_limiter import submit_limiter, search_limiter, import_limiter, retry_after
 
 
 # --- Flask Web Server ---
@@ -46,8 +63,8 @@ HTML_TEMPLATE = """
         h1 { margin-top: 0; color: #2c3e50; text-align: center; }
         
         .form-group { margin-bottom: 1rem; }
-        input[type="text"] { width: 100%; padding: 12px; border: 2px solid #ddd; border-radius: 8px; box-sizing: border-box; font-size: 1rem; transition: border-color 0.3s; margin-top: 5px;}
-        input[type="text"]:focus { border-color: #3498db; outline: none; }
+        input[type="text"], textarea { width: 100%; padding: 12px; border: 2px solid #ddd; border-radius: 8px; box-sizing: border-box; font-size: 1rem; transition: border-color 0.3s; margin-top: 5px;}
+        input[type="text"]:focus, textarea:focus { border-color: #3498db; outline: none; }
         label { font-weight: bold; color: #555; }
         
         button { width: 100%; background: #3498db; color: white; border: none; padding: 12px; border-radius: 8px; cursor: pointer; font-size: 1.1rem; font-weight: bold; transition: background 0.3s; margin-top: 10px; }
@@ -170,10 +187,24 @@ HTML_TEMPLATE = """
             </div>
         </div>
 
+        <div class="section">
+            <h2>Import Playlist</h2>
+            <div class="form-group">
+                <label for="import-text">YouTube playlist link, or one URL per line:</label>
+                <textarea id="import-text" rows="4" placeholder="https://www.youtube.com/playlist?list=..."></textarea>
+            </div>
+            <div class="form-group">
+                <label for="import-file">Or an exported playlist file:</label>
+                <input type="file" id="import-file" accept=".json,.txt">
+            </div>
+            <button id="import-button">Import</button>
+            <p id="import-progress"></p>
+        </div>
+
         <div class="section">
             <h2>Current Queue</h2>
             <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 1rem;">
-                {% if playlist %}
+                {% if has_playlist %}
                     <div>
                         <button onclick="downloadPlaylist()" style="width: auto; margin-top: 0; margin-right: 10px;">Download Current Queue</button>
                         <button onclick="downloadCompletePlaylist()" style="width: auto; margin-top: 0;">Download Full Playlist</button>
@@ -181,95 +212,50 @@ HTML_TEMPLATE = """
                 {% endif %}
             </div>
             <div id="current-queue-section">
-                {% if playlist %}
-                    <table>
-                        <thead>
-                            <tr>
-                                <th style="width: 5%;">#</th>
-                                <th style="width: 35%;">Title</th>
-                                <th style="width: 15%;">User</th>
-                                <th style="width: 25%;">Link</th>
-                                <th style="width: 20%;">Est. Wait</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {% for item in playlist %}
-                            <tr>
-                                <td>{{ loop.index }}</td>
-                                <td>{{ item.title }}</td>
-                                <td><span class="user-tag">{{ item.username }}</span></td>
-                                <td><a href="{{ item.url }}" target="_blank">Watch</a></td>
-                                <td class="wait-time">{{ (loop.index0 * avg_duration) }} mins</td>
-                            </tr>
-                            {% endfor %}
-                        </tbody>
-                    </table>
-                {% else %}
-                    <div class="empty-msg">The queue is currently empty.</div>
-                {% endif %}
+                {{ queue_html|safe }}
             </div>
         </div>
         
         <div class="section">
              <h2>Recently Played</h2>
              <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 1rem;">
-                 {% if played %}
+                 {% if has_played %}
                      <button onclick="downloadHistory('played')" style="width: auto; margin-top: 0;">Download Played History</button>
                  {% endif %}
              </div>
-             {% if played %}
-                <table>
-                    <thead>
-                        <tr>
-                            <th>Title</th>
-                            <th>User</th>
-                            <th>Played At</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {% for item in played|reverse %}
-                        <tr>
-                            <td>{{ item.title }}</td>
-                            <td>{{ item.username }}</td>
-                            <td>{{ item.processed_at }}</td>
-                        </tr>
-                        {% endfor %}
-                    </tbody>
-                </table>
-            {% else %}
-                 <div class="empty-msg">No songs played yet.</div>
-            {% endif %}
+             <table id="played-history-table" {% if not has_played %}style="display: none;"{% endif %}>
+                <thead>
+                    <tr>
+                        <th>Title</th>
+                        <th>User</th>
+                        <th>Played At</th>
+                    </tr>
+                </thead>
+                <tbody></tbody>
+             </table>
+             <div id="played-history-empty" class="empty-msg" {% if has_played %}style="display: none;"{% endif %}>No songs played yet.</div>
+             <div id="played-history-sentinel"></div>
         </div>
 
         <div class="section">
              <h2>Rejected Requests</h2>
              <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 1rem;">
-                 {% if rejected %}
+                 {% if has_rejected %}
                      <button onclick="downloadHistory('rejected')" style="width: auto; margin-top: 0;">Download Rejected History</button>
                  {% endif %}
              </div>
-             {% if rejected %}
-                <table>
-                    <thead>
-                        <tr>
-                            <th>Title</th>
-                            <th>User</th>
-                            <th>Rejected At</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {% for item in rejected|reverse %}
-                        <tr>
-                            <td>{{ item.title }}</td>
-                            <td>{{ item.username }}</td>
-                            <td>{{ item.processed_at }}</td>
-                        </tr>
-                        {% endfor %}
-                    </tbody>
-                </table>
-            {% else %}
-                 <div class="empty-msg">No rejected requests.</div>
-            {% endif %}
+             <table id="rejected-history-table" {% if not has_rejected %}style="display: none;"{% endif %}>
+                <thead>
+                    <tr>
+                        <th>Title</th>
+                        <th>User</th>
+                        <th>Rejected At</th>
+                    </tr>
+                </thead>
+                <tbody></tbody>
+             </table>
+             <div id="rejected-history-empty" class="empty-msg" {% if has_rejected %}style="display: none;"{% endif %}>No rejected requests.</div>
+             <div id="rejected-history-sentinel"></div>
         </div>
     </div>
 
@@ -277,6 +263,7 @@ HTML_TEMPLATE = """
 
     <script>
         document.getElementById('search-button').addEventListener('click', searchYouTube);
+        document.getElementById('import-button').addEventListener('click', importPlaylist);
         document.getElementById('search-query').addEventListener('keypress', function(e) {
             if (e.key === 'Enter') {
                 searchYouTube();
@@ -298,11 +285,18 @@ HTML_TEMPLATE = """
             }, 3000);
         }
 
+        // Last state version and playback clock rendered; the server skips the render when unchanged
+        let queueVersion = null;
+        let queueClock = null;
+
         // Function to refresh the queue display
         async function refreshQueueDisplay() {
             try {
-                const response = await fetch('/api/queue_data');
+                const since = queueVersion === null ? '' : `?since=${queueVersion}&clock=${queueClock}`;
+                const response = await fetch(`/api/queue_data${since}`);
                 const data = await response.json();
+                queueVersion = data.version;
+                queueClock = data.clock;
                 if (data.queue_html) {
                     document.getElementById('current-queue-section').innerHTML = data.queue_html;
                 }
@@ -327,6 +321,10 @@ HTML_TEMPLATE = """
                 const data = await response.json();
 
                 searchResultsDiv.innerHTML = '';
+                if (data.error) {
+                    showNotification(data.error, true);
+                    return;
+                }
                 if (data.results && data.results.length > 0) {
                     data.results.forEach(result => {
                         const itemDiv = document.createElement('div');
@@ -396,6 +394,62 @@ HTML_TEMPLATE = """
             }
         }
 
+        async function importPlaylist() {
+            const username = document.getElementById('username').value;
+            if (!username) {
+                showNotification('Please enter your name before importing a playlist.', true);
+                return;
+            }
+            const form = new FormData();
+            form.append('username', username);
+            form.append('playlist', document.getElementById('import-text').value);
+            const file = document.getElementById('import-file').files[0];
+            if (file) {
+                form.append('file', file);
+            }
+
+            try {
+                const response = await fetch('/api/import_playlist', { method: 'POST', body: form });
+                const result = await response.json();
+                if (result.status !== 'success') {
+                    showNotification(result.message, true);
+                    return;
+                }
+                document.getElementById('import-text').value = '';
+                document.getElementById('import-file').value = '';
+                watchImport(result.job_id);
+            } catch (error) {
+                console.error('Error importing playlist:', error);
+                showNotification('Error importing playlist.', true);
+            }
+        }
+
+        async function watchImport(jobId) {
+            const progress = document.getElementById('import-progress');
+            try {
+                const response = await fetch(`/api/import_playlist/${jobId}`);
+                const job = await response.json();
+                if (job.state === 'failed') {
+                    progress.textContent = '';
+                    showNotification(`Import failed: ${job.error}`, true);
+                } else if (job.state === 'done') {
+                    progress.textContent = '';
+                    let message = `Imported ${job.added} songs (${job.duplicates} duplicates, ${job.skipped} skipped).`;
+                    if (job.limited) {
+                        message += ` ${job.limited} more are over your song limit.`;
+                    }
+                    showNotification(message);
+                    refreshQueueDisplay();
+                } else {
+                    progress.textContent = job.total ? `Looking up songs: ${job.resolved} / ${job.total}` : 'Reading playlist...';
+                    setTimeout(() => watchImport(jobId), 1000);
+                }
+            } catch (error) {
+                console.error('Error checking import progress:', error);
+                progress.textContent = '';
+            }
+        }
+
         function downloadPlaylist() {
             fetch('/api/download_playlist')
                 .then(response => response.json())
@@ -543,8 +597,192 @@ HTML_TEMPLATE = """
                 });
         }
 
+        // History tables load one page at a time as they scroll into view
+        const HISTORY_TYPES = ['played', 'rejected'];
+        const historyState = {};
+
+        function freshHistoryState() {
+            // newestSeq is only trusted once the first page is in (loaded)
+            return { nextCursor: null, newestSeq: 0, loading: false, done: false, loaded: false, refreshing: false, stale: false };
+        }
+
+        function historyRow(item) {
+            const row = document.createElement('tr');
+            [item.title, item.username, item.processed_at].forEach(value => {
+                const cell = document.createElement('td');
+                cell.textContent = value;
+                row.appendChild(cell);
+            });
+            return row;
+        }
+
+        function showHistoryTable(type, hasItems) {
+            document.getElementById(`${type}-history-table`).style.display = hasItems ? '' : 'none';
+            document.getElementById(`${type}-history-empty`).style.display = hasItems ? 'none' : '';
+        }
+
+        function resetHistory() {
+            // The page fell too far behind the server; start both tables over
+            HISTORY_TYPES.forEach(type => {
+                historyState[type] = freshHistoryState();
+                document.querySelector(`#${type}-history-table tbody`).replaceChildren();
+                loadOlderHistory(type);
+            });
+        }
+
+        async function loadOlderHistory(type) {
+            const state = historyState[type];
+            if (state.loading || state.done) {
+                return;
+            }
+            state.loading = true;
+            try {
+                const after = state.nextCursor === null ? '' : `&after=${state.nextCursor}`;
+                const response = await fetch(`/api/history/${type}?limit=50${after}`);
+                const data = await response.json();
+                if (historyState[type] !== state) {
+                    return;  // Reset while loading
+                }
+                const tbody = document.querySelector(`#${type}-history-table tbody`);
+                data.items.forEach(item => tbody.appendChild(historyRow(item)));
+                if (!state.loaded) {
+                    state.loaded = true;
+                    state.newestSeq = data.items.length > 0 ? data.items[0].seq : 0;
+                }
+                state.nextCursor = data.next_cursor;
+                state.done = data.next_cursor === null;
+                showHistoryTable(type, tbody.children.length > 0);
+            } catch (error) {
+                console.error(`Error loading ${type} history:`, error);
+            } finally {
+                state.loading = false;
+            }
+            if (state.stale && historyState[type] === state) {
+                loadNewerHistory(type);
+            }
+        }
+
+        async function loadNewerHistory(type) {
+            const state = historyState[type];
+            // Until the first page is in, or while a fetch runs, note the change and catch up afterwards
+            if (!state.loaded || state.refreshing) {
+                state.stale = true;
+                return;
+            }
+            state.stale = false;
+            state.refreshing = true;
+            try {
+                // Pages come newest first; follow the cursor back until we reach what is shown
+                const items = [];
+                let after = '';
+                while (true) {
+                    const response = await fetch(`/api/history/${type}?limit=50&newer_than=${state.newestSeq}${after}`);
+                    const data = await response.json();
+                    items.push(...data.items);
+                    if (data.items.length === 0 || data.next_cursor === null || data.next_cursor - 1 <= state.newestSeq) {
+                        break;
+                    }
+                    after = `&after=${data.next_cursor}`;
+                }
+                if (historyState[type] !== state) {
+                    return;  // Reset while loading
+                }
+                const tbody = document.querySelector(`#${type}-history-table tbody`);
+                // Insert oldest first so the newest ends on top
+                items.slice().reverse().forEach(item => tbody.insertBefore(historyRow(item), tbody.firstChild));
+                if (items.length > 0) {
+                    state.newestSeq = items[0].seq;
+                }
+                showHistoryTable(type, tbody.children.length > 0);
+            } catch (error) {
+                console.error(`Error loading ${type} history:`, error);
+            } finally {
+                state.refreshing = false;
+            }
+            if (state.stale && historyState[type] === state) {
+                loadNewerHistory(type);
+            }
+        }
+
+        function watchHistory(type) {
+            const sentinel = document.getElementById(`${type}-history-sentinel`);
+            if (!window.IntersectionObserver) {
+                loadOlderHistory(type);
+                return;
+            }
+            new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    loadOlderHistory(type);
+                }
+            }, { rootMargin: '200px' }).observe(sentinel);
+        }
+
+        function onQueueEvent(event) {
+            scheduleQueueRefresh();
+            const change = JSON.parse(event.data);
+            if (change.kind === 'play') {
+                loadNewerHistory('played');
+            } else if (change.kind === 'reject') {
+                loadNewerHistory('rejected');
+            }
+        }
+
+        // Queue changes are pushed over Server-Sent Events; poll only as a fallback
+        let queuePollTimer = null;
+        let queueRefreshPending = false;
+
+        function scheduleQueueRefresh() {
+            // Coalesce bursts of events into one refresh
+            if (queueRefreshPending) {
+                return;
+            }
+            queueRefreshPending = true;
+            setTimeout(() => {
+                queueRefreshPending = false;
+                refreshQueueDisplay();
+            }, 250);
+        }
+
+        function startQueuePolling() {
+            if (!queuePollTimer) {
+                queuePollTimer = setInterval(refreshQueueDisplay, 5000);
+            }
+        }
+
+        function subscribeToQueueEvents() {
+            if (!window.EventSource) {
+                startQueuePolling();
+                return;
+            }
+            const source = new EventSource('/api/events');
+            source.addEventListener('queue', onQueueEvent);
+            source.addEventListener('reset', () => {
+                scheduleQueueRefresh();
+                resetHistory();
+            });
+            source.addEventListener('open', () => {
+                if (queuePollTimer) {
+                    clearInterval(queuePollTimer);
+                    queuePollTimer = null;
+                }
+            });
+            source.addEventListener('error', () => {
+                // EventSource reconnects by itself; keep the page fresh meanwhile
+                startQueuePolling();
+            });
+        }
+
         // Initial refresh of the queue when the page loads
-        document.addEventListener('DOMContentLoaded', refreshQueueDisplay);
+        document.addEventListener('DOMContentLoaded', () => {
+            refreshQueueDisplay();
+            subscribeToQueueEvents();
+            // Wait estimates count down with the playing track even without queue events
+            setInterval(refreshQueueDisplay, 30000);
+            HISTORY_TYPES.forEach(type => {
+                historyState[type] = freshHistoryState();
+                watchHistory(type);
+            });
+        });
     </script>
 </body>
 </html>
@@ -574,11 +812,17 @@ PLAYER_TEMPLATE = """
     <script>
         let currentVideoId = null;
         let currentTitle = null;
+        let stateVersion = null;
 
         function pollForUpdates() {
-            fetch('/api/current')
+            const since = stateVersion === null ? '' : `?since=${stateVersion}`;
+            fetch(`/api/current${since}`)
                 .then(response => response.json())
                 .then(data => {
+                    stateVersion = data.version;
+                    if (data.unchanged) {
+                        return;
+                    }
                     if (data.video_id && data.video_id !== currentVideoId) {
                         currentVideoId = data.video_id;
                         updatePlayer(data.title || 'Unknown Title');
@@ -592,54 +836,309 @@ PLAYER_TEMPLATE = """
             titleElement.textContent = title;
         }
 
-        // Poll every 2 seconds
-        setInterval(pollForUpdates, 2000);
+        function showNowPlaying(data) {
+            if (data.video_id && data.video_id !== currentVideoId) {
+                currentVideoId = data.video_id;
+                updatePlayer(data.title || 'Unknown Title');
+            }
+        }
+
+        // Prefer pushed updates; fall back to polling every 2 seconds
+        let pollTimer = null;
+
+        function startPolling() {
+            if (!pollTimer) {
+                pollTimer = setInterval(pollForUpdates, 2000);
+            }
+        }
+
+        if (window.EventSource) {
+            const source = new EventSource('/api/events');
+            source.addEventListener('now_playing', (event) => showNowPlaying(JSON.parse(event.data)));
+            source.addEventListener('open', () => {
+                if (pollTimer) {
+                    clearInterval(pollTimer);
+                    pollTimer = null;
+                }
+            });
+            source.addEventListener('error', startPolling);
+        } else {
+            startPolling();
+        }
     </script>
 </body>
 </html>
 """
 
 
+QUEUE_TABLE_TEMPLATE = """
+{% if playlist %}
+    <table>
+        <thead>
+            <tr>
+                <th style="width: 5%;">#</th>
+                <th style="width: 35%;">Title</th>
+                <th style="width: 15%;">User</th>
+                <th style="width: 25%;">Link</th>
+                <th style="width: 20%;">Est. Wait</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for item in playlist %}
+            <tr data-item-id="{{ item.id }}">
+                <td>{{ loop.index }}</td>
+                <td>{{ item.title }}</td>
+                <td><span class="user-tag">{{ item.username }}</span></td>
+                <td><a href="{{ item.url }}" target="_blank">Watch</a></td>
+                <td class="wait-time">{{ format_wait(waits[loop.index0]) }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+{% else %}
+    <div class="empty-msg">The queue is currently empty.</div>
+{% endif %}
+"""
+
+# Templates are compiled once at import instead of on every request
+index_template = flask_app.jinja_env.from_string(HTML_TEMPLATE)
+player_template = flask_app.jinja_env.from_string(PLAYER_TEMPLATE)
+queue_table_template = flask_app.jinja_env.from_string(QUEUE_TABLE_TEMPLATE)
+
+# Rendered /api/queue_data body for the latest state version and playback clock
+_queue_fragment_lock = threading.Lock()
+_queue_fragment_key = (-1, -1)
+_queue_fragment_html = ""
+_queue_fragment_body = b""
+
+
+def _playback_clock():
+    """Whole minutes left of the current track; wait estimates move when it does"""
+    return math.ceil(data_models.playback_remaining() / 60)
+
+
+def _queue_snapshot(key):
+    """Cheap copy of the queue taken under queue_lock, skipped if the cache is current"""
+    if key == _queue_fragment_key:
+        return None
+    return music_playlist.snapshot_with_waits()
+
+
+def _render_queue(key, playlist):
+    """Render the queue table outside queue_lock, caching it per (version, clock).
+
+    Returns the fragment HTML and the /api/queue_data JSON body. playlist is
+    None when the cache already held this key at snapshot time.
+    """
+    global _queue_fragment_key, _queue_fragment_html, _queue_fragment_body
+    with _queue_fragment_lock:
+        if playlist is None or key == _queue_fragment_key:
+            return _queue_fragment_html, _queue_fragment_body
+    version, clock = key
+    items, ahead = playlist
+    html = queue_table_template.render(
+        playlist=items,
+        waits=[seconds + clock * 60 for seconds in ahead],
+        format_wait=format_wait,
+    )
+    body = json.dumps({"version": version, "clock": clock, "queue_html": html}).encode("utf-8")
+    with _queue_fragment_lock:
+        # A slower render of an older version must not replace a newer one
+        if version >= _queue_fragment_key[0]:
+            _queue_fragment_key = key
+            _queue_fragment_html = html
+            _queue_fragment_body = body
+    return html, body
+
+
+def _throttled(limiter, keys, payload):
+    """A 429 response if the client is out of tokens, otherwise None"""
+    allowed, wait = limiter.acquire(keys)
+    if allowed:
+        return None
+    response = jsonify(payload)
+    response.status_code = 429
+    response.headers["Retry-After"] = retry_after(wait)
+    return response
+
+
 @flask_app.route("/api/search")
 def search_youtube_api():
     query = request.args.get("query", "").strip()
     if not query:
         return jsonify({"error": "Query parameter is missing"}), 400
-    
-    search_results = perform_youtube_search(query)
+
+    throttled = _throttled(
+        search_limiter,
+        [f"ip:{request.remote_addr}"],
+        {"error": "Too many searches. Take a breath and try again in a moment."},
+    )
+    if throttled:
+        return throttled
+
+    search_results = youtube_search_cache.search(query)
     return jsonify({"results": search_results})
 
 
+@flask_app.route("/api/search/suggest")
+def search_suggest_api():
+    prefix = request.args.get("query", "").strip()
+    return jsonify(youtube_search_cache.suggest(prefix))
+
+
 @flask_app.route("/", methods=["GET"]) # Changed to only GET
 def index():
+    clock = _playback_clock()
     with queue_lock:
-        return render_template_string(
-            HTML_TEMPLATE,
-            playlist=list(music_playlist),
-            played=list(played_history),
-            rejected=list(rejected_history),
-            avg_duration=AVERAGE_SONG_DURATION_MIN,
-        )
+        key = (data_models.state_version, clock)
+        playlist = _queue_snapshot(key)
+        has_playlist = bool(music_playlist)
+        has_played = bool(played_history)
+        has_rejected = bool(rejected_history)
+    queue_html = _render_queue(key, playlist)[0]
+    # History is lazy-loaded by the page through /api/history
+    return render_template(
+        index_template,
+        has_playlist=has_playlist,
+        queue_html=queue_html,
+        has_played=has_played,
+        has_rejected=has_rejected,
+    )
 
 
 @flask_app.route("/player")
 def player():
-    return render_template_string(PLAYER_TEMPLATE)
+    return render_template(player_template)
 
 
 @flask_app.route("/api/current")
 def current_song():
     with queue_lock:
-        # Find the currently playing item to get its title
+        version = data_models.state_version
+        if request.args.get("since", type=int) == version:
+            return jsonify({"version": version, "unchanged": True})
+
         current_title = "Waiting for music..."
-        if current_video_id and played_history:
-            # Look for the most recently played item
-            for item in reversed(played_history):
-                if extract_video_id(item.url) == current_video_id:
-                    current_title = item.title
-                    break
+        now_playing = data_models.now_playing
+        if now_playing:
+            current_title = now_playing.title
         
-        return jsonify({"video_id": current_video_id, "title": current_title})
+        return jsonify({
+            "version": version,
+            "video_id": data_models.current_video_id,
+            "title": current_title,
+        })
+
+
+# Event data also feeds the journal, which needs every field; browsers only get these
+PUBLIC_EVENT_FIELDS = frozenset((
+    "id", "title", "username", "url", "status", "duration", "video_id",
+    "added_at", "processed_at", "before_id", "direction",
+))
+
+
+def _public_event(e):
+    """An event as sent to browsers, without the submitter's IP"""
+    return {
+        "version": e.version,
+        "kind": e.kind,
+        "item_id": e.item_id,
+        "data": {name: value for name, value in e.data.items() if name in PUBLIC_EVENT_FIELDS},
+    }
+
+
+@flask_app.route("/api/changes")
+def changes_api():
+    since = request.args.get("since", 0, type=int)
+    version, events = changes_since(since)
+    if events is None:
+        # The client is too far behind the event log and must reload a snapshot
+        return jsonify({"version": version, "reset": True, "events": []})
+    return jsonify({
+        "version": version,
+        "reset": False,
+        "events": [_public_event(e) for e in events],
+    })
+
+
+SSE_KEEPALIVE_SECONDS = 15
+SSE_THREAD_SHARE = 0.5  # Share of server threads that open /api/events streams may hold
+
+# Each open stream holds a server thread for as long as the page is open, so
+# streams are capped below the thread count; the rest of the pool keeps serving
+# ordinary requests. Clients over the cap get a 503 and fall back to polling.
+_sse_slots = None  # Set by configure_sse
+
+
+def configure_sse(threads):
+    """Size the stream cap for a server with this many worker threads"""
+    global _sse_slots
+    _sse_slots = threading.BoundedSemaphore(max(1, int(threads * SSE_THREAD_SHARE)))
+
+
+def _now_playing_payload():
+    with queue_lock:
+        now_playing = data_models.now_playing
+        return {
+            "video_id": data_models.current_video_id,
+            "title": now_playing.title if now_playing else "Waiting for music...",
+        }
+
+
+def _sse(event, data, version=None):
+    message = f"event: {event}\n"
+    if version is not None:
+        message += f"id: {version}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+@flask_app.route("/api/events")
+def events_stream():
+    """Server-Sent Events stream of now-playing and queue delta events"""
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = request.args.get("since", type=int)
+    slots = _sse_slots
+    if not slots.acquire(blocking=False):
+        # EventSource gives up on a 503, and the page switches to polling
+        response = Response("Too many live listeners, poll instead.\n", status=503, mimetype="text/plain")
+        response.headers["Retry-After"] = str(SSE_KEEPALIVE_SECONDS)
+        return response
+
+    def stream():
+        version = data_models.state_version if since is None else since
+        yield "retry: 3000\n\n"
+        yield _sse("now_playing", _now_playing_payload(), version)
+        while True:
+            if wait_for_change(version, timeout=SSE_KEEPALIVE_SECONDS) == version:
+                yield ": keepalive\n\n"
+                continue
+            new_version, events = changes_since(version)
+            if events is None:
+                yield _sse("reset", {"version": new_version}, new_version)
+                yield _sse("now_playing", _now_playing_payload(), new_version)
+            else:
+                for e in events:
+                    yield _sse("queue", _public_event(e), e.version)
+                    if e.kind == "play":
+                        yield _sse("now_playing", _now_playing_payload(), e.version)
+            version = new_version
+
+    response = Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs when the server closes the stream, even if it was never iterated
+    response.call_on_close(slots.release)
+    return response
+
+
+@flask_app.route("/api/prefetch_stats")
+def prefetch_stats_api():
+    stats = stream_prefetcher.stats()
+    stats["audio_cache"] = audio_cache.stats()
+    return jsonify(stats)
 
 
 @flask_app.route("/api/add_to_queue", methods=["POST"])
@@ -655,144 +1154,326 @@ def add_to_queue_api():
     if not is_valid_youtube_url(url):
         return jsonify({"status": "error", "message": "Invalid YouTube URL."}), 400
 
-    title = title_from_search if title_from_search else get_youtube_title(url)
+    # Charged to both the address and the name, so neither a new name nor a new device resets it
+    throttled = _throttled(
+        submit_limiter,
+        [f"ip:{user_ip}", f"user:{username.lower()}"],
+        {"status": "error", "message": "Slow down! You've added plenty of songs, try again in a bit."},
+    )
+    if throttled:
+        return throttled
 
-    with queue_lock:
-        item = QueueItem(
+    # Accept immediately; the title and duration resolve in the background
+    item = title_resolver.prepare(
+        QueueItem(
             url=url,
-            title=title,
+            title=title_from_search or "",
             ip=str(user_ip),
             username=username,
-            added_at=datetime.datetime.now().strftime("%H:%M:%S"),
-        )
-        music_playlist.append(item)
-    
-    return jsonify({"status": "success", "message": f"Successfully added '{title}'!"})
+        ),
+        keep_title=bool(title_from_search),
+    )
+    # Duplicates are settled here, before any title lookup is started. The
+    # queued copy's position is read under the same lock, before it can play.
+    with queue_lock:
+        outcome, existing = submit_item(item)
+        position = music_playlist.position(existing.id) if outcome in ("merged", "queued") else None
+    if outcome == "merged":
+        return jsonify({
+            "status": "success",
+            "message": f"'{existing.title}' is already queued at #{position + 1}, requested by {existing.username}.",
+            "item_id": existing.id,
+            "item_status": existing.status,
+            "merged": True,
+        })
+    if outcome == "queued":
+        return jsonify({
+            "status": "error",
+            "message": f"'{existing.title}' is already in the queue at #{position + 1}.",
+            "item_id": existing.id,
+        }), 409
+    if outcome == "played":
+        return jsonify({
+            "status": "error",
+            "message": f"'{existing.title}' was played recently. Give it a rest.",
+        }), 409
+    title_resolver.submit(item, keep_title=bool(title_from_search))
+
+    if item.status == "pending":
+        message = "Added to the queue! Fetching the title..."
+    else:
+        message = f"Successfully added '{item.title}'!"
+    return jsonify({"status": "success", "message": message, "item_id": item.id, "item_status": item.status})
+
+
+IMPORT_MAX_BYTES = 1024 * 1024  # Larger import requests are refused
+
+
+@flask_app.route("/api/import_playlist", methods=["POST"])
+def import_playlist_api():
+    """Start a bulk import; progress is polled from /api/import_playlist/<job_id>"""
+    request.max_content_length = IMPORT_MAX_BYTES
+    try:
+        username = request.form.get("username", "Anonymous").strip()
+        upload = request.files.get("file")
+        text = upload.read().decode("utf-8", errors="replace") if upload else request.form.get("playlist", "")
+    except RequestEntityTooLarge:
+        return jsonify({"status": "error", "message": "That playlist is too large to import."}), 413
+    user_ip = request.remote_addr or "Unknown"
+
+    if not text.strip():
+        return jsonify({"status": "error", "message": "Nothing to import."}), 400
+
+    keys = [f"ip:{user_ip}", f"user:{username.lower()}"]
+    throttled = _throttled(
+        import_limiter,
+        keys,
+        {"status": "error", "message": "You've imported a playlist recently, try again in a bit."},
+    )
+    if throttled:
+        return throttled
+
+    # Every imported song is charged like a single submission, so an import
+    # cannot get round the per-guest song limit
+    job = playlist_importer.start(
+        text, username, str(user_ip), quota=lambda wanted: submit_limiter.acquire_up_to(keys, wanted),
+    )
+    return jsonify({"status": "success", "message": "Importing playlist...", "job_id": job.id}), 202
+
+
+@flask_app.route("/api/import_playlist/<int:job_id>")
+def import_progress_api(job_id):
+    job = playlist_importer.get(job_id)
+    if job is None:
+        return jsonify({"error": "No such import."}), 404
+    return jsonify(job.progress())
+
+
+@flask_app.route("/api/queue/<int:item_id>")
+def queue_item_api(item_id):
+    with queue_lock:
+        item = music_playlist.get(item_id)
+        if item is None:
+            return jsonify({"error": "Item is not in the queue."}), 404
+        position = music_playlist.position(item_id)
+        wait = estimated_wait(item_id)
+        return jsonify({
+            "id": item.id,
+            "position": position + 1,
+            "title": item.title,
+            "username": item.username,
+            "url": item.url,
+            "estimated_wait": format_wait(wait),
+            "estimated_wait_seconds": round(wait),
+        })
 
 
 @flask_app.route("/api/queue_data")
 def queue_data_api():
+    clock = _playback_clock()
     with queue_lock:
-        # Render only the queue table part of the template
-        queue_html = render_template_string(
-            """
-            {% if playlist %}
-                <table>
-                    <thead>
-                        <tr>
-                            <th style="width: 5%;">#</th>
-                            <th style="width: 35%;">Title</th>
-                            <th style="width: 15%;">User</th>
-                            <th style="width: 25%;">Link</th>
-                            <th style="width: 20%;">Est. Wait</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {% for item in playlist %}
-                        <tr>
-                            <td>{{ loop.index }}</td>
-                            <td>{{ item.title }}</td>
-                            <td><span class="user-tag">{{ item.username }}</span></td>
-                            <td><a href="{{ item.url }}" target="_blank">Watch</a></td>
-                            <td class="wait-time">{{ (loop.index0 * avg_duration) }} mins</td>
-                        </tr>
-                        {% endfor %}
-                    </tbody>
-                </table>
-            {% else %}
-                <div class="empty-msg">The queue is currently empty.</div>
-            {% endif %}
-            """,
-            playlist=list(music_playlist),
-            avg_duration=AVERAGE_SONG_DURATION_MIN,
-        )
-    return jsonify({"queue_html": queue_html})
+        version = data_models.state_version
+        if request.args.get("since", type=int) == version and request.args.get("clock", type=int) == clock:
+            return jsonify({"version": version, "clock": clock, "unchanged": True})
+        key = (version, clock)
+        playlist = _queue_snapshot(key)
+
+    etag = f"queue-{version}-{clock}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(_render_queue(key, playlist)[1], mimetype="application/json")
+    response.set_etag(etag)
+    return response
 
 
 @flask_app.route("/api/download_playlist")
 def download_playlist_api():
-    with queue_lock:
-        playlist_data = []
-        for i, item in enumerate(music_playlist):
-            playlist_data.append({
-                "position": i + 1,
+    items, waits = queue_with_waits()
+    playlist_data = []
+    for i, item in enumerate(items):
+        playlist_data.append({
+            "id": item.id,
+            "position": i + 1,
+            "title": item.title,
+            "username": item.username,
+            "url": item.url,
+            "estimated_wait": format_wait(waits[i])
+        })
+
+    return jsonify({"playlist": playlist_data})
+
+
+HISTORIES = {"played": "Played", "rejected": "Rejected"}
+HISTORY_PAGE_LIMIT_MAX = 500
+
+
+@flask_app.route("/api/history/<history_type>")
+def history_api(history_type):
+    """Cursor-paginated history, newest first"""
+    if history_type not in HISTORIES:
+        return jsonify({"error": "Invalid history type. Use 'played' or 'rejected'."}), 400
+    limit = min(max(request.args.get("limit", HISTORY_PAGE_SIZE, type=int), 1), HISTORY_PAGE_LIMIT_MAX)
+    page, next_cursor, total = history_page(
+        history_type,
+        limit=limit,
+        after=request.args.get("after", type=int),
+        newer_than=request.args.get("newer_than", type=int),
+    )
+    return jsonify({
+        "items": [
+            {
+                "seq": seq,
+                "id": item.id,
                 "title": item.title,
                 "username": item.username,
-                "url": item.url,
-                "estimated_wait": f"{i * AVERAGE_SONG_DURATION_MIN} mins"
-            })
-    
-    return jsonify({"playlist": playlist_data})
+                "processed_at": item.processed_time,
+            }
+            for seq, item in page
+        ],
+        "next_cursor": next_cursor,
+        "total": total,
+    })
 
 
 @flask_app.route("/api/download_history/<history_type>")
 def download_history_api(history_type):
-    with queue_lock:
-        if history_type == 'played':
-            history_data = []
-            for item in played_history:
-                history_data.append({
-                    "title": item.title,
-                    "username": item.username,
-                    "processed_at": item.processed_at
-                })
-            return jsonify({"history_type": "Played", "history": history_data})
-        elif history_type == 'rejected':
-            history_data = []
-            for item in rejected_history:
-                history_data.append({
-                    "title": item.title,
-                    "username": item.username,
-                    "processed_at": item.processed_at
-                })
-            return jsonify({"history_type": "Rejected", "history": history_data})
-        else:
-            return jsonify({"error": "Invalid history type. Use 'played' or 'rejected'."}), 400
+    if history_type not in HISTORIES:
+        return jsonify({"error": "Invalid history type. Use 'played' or 'rejected'."}), 400
+    limit = request.args.get("limit", type=int)
+    if limit is None and request.args.get("after") is None:
+        items = history_items(history_type)
+    else:
+        page, _, _ = history_page(
+            history_type,
+            limit=limit or HISTORY_PAGE_SIZE,
+            after=request.args.get("after", type=int),
+        )
+        items = [item for _, item in reversed(page)]
+    history_data = []
+    for item in items:
+        history_data.append({
+            "title": item.title,
+            "username": item.username,
+            "processed_at": item.processed_time
+        })
+    return jsonify({"history_type": HISTORIES[history_type], "history": history_data})
 
 
 @flask_app.route("/api/download_complete_playlist")
 def download_complete_playlist_api():
-    with queue_lock:
-        # Combine queued, played, and rejected items
-        complete_playlist = {
-            "queued": [],
-            "played": [],
-            "rejected": []
-        }
-        
-        # Add queued items
-        for i, item in enumerate(music_playlist):
-            complete_playlist["queued"].append({
-                "position": i + 1,
-                "title": item.title,
-                "username": item.username,
-                "url": item.url,
-                "estimated_wait": f"{i * AVERAGE_SONG_DURATION_MIN} mins"
-            })
-        
-        # Add played items
-        for item in played_history:
-            complete_playlist["played"].append({
-                "title": item.title,
-                "username": item.username,
-                "processed_at": item.processed_at
-            })
-        
-        # Add rejected items
-        for item in rejected_history:
-            complete_playlist["rejected"].append({
+    # Combine queued, played, and rejected items
+    complete_playlist = {
+        "queued": [],
+        "played": [],
+        "rejected": []
+    }
+
+    # Add queued items
+    items, waits = queue_with_waits()
+    for i, item in enumerate(items):
+        complete_playlist["queued"].append({
+            "id": item.id,
+            "position": i + 1,
+            "title": item.title,
+            "username": item.username,
+            "url": item.url,
+            "estimated_wait": format_wait(waits[i])
+        })
+
+    # Add played and rejected items
+    for history_type in ("played", "rejected"):
+        for item in history_items(history_type):
+            complete_playlist[history_type].append({
                 "title": item.title,
                 "username": item.username,
-                "processed_at": item.processed_at
+                "processed_at": item.processed_time
             })
-    
+
     return jsonify(complete_playlist)
 
 
-def run_flask():
+@flask_app.route("/api/stats/top_requesters")
+def top_requesters_api():
+    history_type = request.args.get("type", "played")
+    if history_type not in HISTORIES:
+        return jsonify({"error": "Invalid history type. Use 'played' or 'rejected'."}), 400
+    limit = min(max(request.args.get("limit", STATS_LIMIT, type=int), 1), HISTORY_PAGE_LIMIT_MAX)
+    return jsonify({"history_type": HISTORIES[history_type], "requesters": top_requesters(limit, history_type)})
+
+
+@flask_app.route("/api/stats/most_played")
+def most_played_api():
+    limit = min(max(request.args.get("limit", STATS_LIMIT, type=int), 1), HISTORY_PAGE_LIMIT_MAX)
+    return jsonify({"songs": most_played(limit)})
+
+
+# Serving defaults; waitress keeps connections alive and serves requests from a
+# thread pool, so one slow title lookup or search no longer stalls other guests.
+# Open /api/events streams may take at most SSE_THREAD_SHARE of the threads,
+# so the default keeps 64 pages on push (a party of ~40 phones with room for
+# reconnects) and 64 threads for ordinary requests.
+SERVER_MODE = "waitress"  # "waitress" or "dev" (Werkzeug development server)
+SERVER_PORT = 5000
+SERVER_THREADS = 128
+SERVER_CONNECTION_LIMIT = 200
+SERVER_CHANNEL_TIMEOUT = 60  # Seconds an idle or stalled connection is kept open
+
+configure_sse(SERVER_THREADS)
+
+
+def make_server(
+    host="0.0.0.0",
+    port=SERVER_PORT,
+    threads=SERVER_THREADS,
+    connection_limit=SERVER_CONNECTION_LIMIT,
+    channel_timeout=SERVER_CHANNEL_TIMEOUT,
+):
+    """A waitress server for flask_app, not yet running. Needs waitress installed."""
+    from waitress.server import create_server
+
+    configure_sse(threads)
+    return create_server(
+        flask_app,
+        host=host,
+        port=port,
+        threads=threads,
+        connection_limit=connection_limit,
+        channel_timeout=channel_timeout,
+        ident="moojik",
+    )
+
+
+def serve_app(
+    mode=SERVER_MODE,
+    port=SERVER_PORT,
+    threads=SERVER_THREADS,
+    connection_limit=SERVER_CONNECTION_LIMIT,
+    channel_timeout=SERVER_CHANNEL_TIMEOUT,
+):
+    """Serve flask_app in the calling thread with the chosen server"""
+    if mode == "waitress":
+        try:
+            server = make_server(
+                port=port,
+                threads=threads,
+                connection_limit=connection_limit,
+                channel_timeout=channel_timeout,
+            )
+        except ImportError:
+            print("waitress is not installed, falling back to the Flask development server")
+        else:
+            server.run()
+            return
+    flask_app.run(host="0.0.0.0", port=port, debug=False, use_reloader=False, threaded=True)
+
+
+def run_flask(**server_options):
     import socket
     from zeroconf import ServiceInfo, Zeroconf
 
+    port = server_options.get("port", SERVER_PORT)
+
     zeroconf = None
     info = None
     try:
@@ -807,15 +1488,15 @@ def run_flask():
             "_http._tcp.local.",
             "Moojik Queue._http._tcp.local.",
             addresses=[socket.inet_aton(ip_address)],
-            port=5000,
+            port=port,
             properties=desc,
             server="moojik.local.",
         )
         zeroconf = Zeroconf()
         zeroconf.register_service(info)
-        print(f"mDNS service registered: http://moojik.local:5000 (or http://{ip_address}:5000)")
+        print(f"mDNS service registered: http://moojik.local:{port} (or http://{ip_address}:{port})")
 
-        flask_app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)
+        serve_app(**server_options)
     finally:
         if zeroconf:
             print("Unregistering mDNS service...")
@@ -0,0 +1,220 @@
+import logging
+import queue
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import data_models
+from data_models import QueueItem, StateEvent, queue_lock, HISTORY_LISTS, STATS_LIMIT
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_FILE = "history.db"
+HISTORY_SYNC_TIMEOUT = 1.0  # Longest a reader waits for the writer to catch up
+
+_COLUMNS = "id, seq, video_id, url, title, username, ip, added_at, processed_at, duration, status"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    kind TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    video_id TEXT,
+    url TEXT NOT NULL,
+    title TEXT,
+    username TEXT,
+    ip TEXT,
+    added_at REAL,
+    processed_at REAL,
+    duration REAL,
+    status TEXT,
+    PRIMARY KEY (kind, seq)
+);
+CREATE INDEX IF NOT EXISTS history_id ON history (id);
+CREATE INDEX IF NOT EXISTS history_video ON history (kind, video_id);
+CREATE INDEX IF NOT EXISTS history_username ON history (kind, username);
+CREATE INDEX IF NOT EXISTS history_ip ON history (kind, ip);
+CREATE INDEX IF NOT EXISTS history_processed ON history (kind, processed_at);
+"""
+
+# Statements are constant strings so sqlite3 prepares each one once per connection
+_INSERT = f"INSERT OR REPLACE INTO history (kind, {_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_UPDATE = "UPDATE history SET title = ?, duration = ?, status = ? WHERE id = ?"
+_PAGE = f"SELECT {_COLUMNS} FROM history WHERE kind = ? AND seq <= ? AND seq > ? ORDER BY seq DESC LIMIT ?"
+_ALL = f"SELECT {_COLUMNS} FROM history WHERE kind = ? ORDER BY seq"
+_COUNT = "SELECT COALESCE(MAX(seq), 0) FROM history WHERE kind = ?"
+_TOP_REQUESTERS = """
+SELECT username, COUNT(*) AS songs FROM history
+WHERE kind = ?
+GROUP BY username ORDER BY songs DESC, username LIMIT ?
+"""
+_MOST_PLAYED = """
+SELECT video_id, COUNT(*) AS plays, MAX(seq) AS last_seq FROM history
+WHERE kind = 'played' AND video_id IS NOT NULL
+GROUP BY video_id ORDER BY plays DESC, last_seq DESC LIMIT ?
+"""
+_LATEST_BY_SEQ = "SELECT title, url FROM history WHERE kind = 'played' AND seq = ?"
+
+
+def _row(kind: str, seq: int, item: QueueItem) -> tuple:
+    return (
+        kind, item.id, seq, item.video_id, item.url, item.title, item.username,
+        item.ip, item.added_at, item.processed_at, item.duration, item.status,
+    )
+
+
+def _item(row: tuple) -> Tuple[int, QueueItem]:
+    item_id, seq, video_id, url, title, username, ip, added_at, processed_at, duration, status = row
+    return seq, QueueItem(
+        url=url, title=title, ip=ip, username=username, added_at=added_at,
+        processed_at=processed_at, id=item_id, status=status, duration=duration, video_id=video_id,
+    )
+
+
+class HistoryStore:
+    """Played and rejected history mirrored into SQLite for indexed queries.
+
+    The in-memory lists stay the source of truth. A state listener hands each
+    play, reject and update to a writer thread, which commits them in WAL mode,
+    so mutations never wait on the database. Readers use one connection per
+    thread and first wait until the writer has caught up with the state
+    version they saw, so a page never misses an item that was just played.
+    """
+
+    def __init__(self, path: str = HISTORY_DB_FILE):
+        self.path = path
+        self.pending: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self.local = threading.local()
+        self.written_version = 0
+        self.written = threading.Condition()
+        self.writer = None
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    # --- Writing ---
+
+    def attach(self):
+        """Bring the database in line with memory and start mirroring new events.
+
+        Call after the journal has been recovered and before clients connect.
+        """
+        # Handed to the writer thread once the backfill is done
+        conn = self._connect(check_same_thread=False)
+        conn.executescript(_SCHEMA)
+        with queue_lock:
+            with conn:
+                for kind, history in HISTORY_LISTS.items():
+                    # Rows past the end belong to an older session that was reset
+                    conn.execute("DELETE FROM history WHERE kind = ? AND seq > ?", (kind, len(history)))
+                    conn.executemany(
+                        _INSERT,
+                        (_row(kind, seq, item) for seq, item in enumerate(history, 1)),
+                    )
+            self.written_version = data_models.state_version
+            data_models.event_listeners.append(self._on_event)
+            data_models.history_backend = self
+        self.writer = threading.Thread(target=self._write_loop, args=(conn,), name="history-store", daemon=True)
+        self.writer.start()
+
+    def close(self):
+        if self.writer is None:
+            return
+        if self._on_event in data_models.event_listeners:
+            data_models.event_listeners.remove(self._on_event)
+        if data_models.history_backend is self:
+            data_models.history_backend = None
+        self.pending.put(None)
+        self.writer.join()
+        self.writer = None
+
+    def _on_event(self, event: StateEvent, item: QueueItem):
+        # Runs under queue_lock; capture the row now so the writer sees this version of the item
+        if event.kind in ("play", "reject"):
+            kind = "played" if event.kind == "play" else "rejected"
+            op = (_INSERT, _row(kind, len(HISTORY_LISTS[kind]), item))
+        elif event.kind == "update":
+            op = (_UPDATE, (item.title, item.duration, item.status, item.id))
+        else:
+            op = None
+        self.pending.put((event.version, op))
+
+    def _write_loop(self, conn: sqlite3.Connection):
+        running = True
+        while running:
+            batch = [self.pending.get()]
+            while True:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                running = False
+            try:
+                with conn:
+                    for _, op in batch:
+                        if op is not None:
+                            conn.execute(*op)
+            except sqlite3.Error as e:
+                logger.error(f"Writing history to {self.path} failed: {e}")
+            if batch:
+                with self.written:
+                    self.written_version = batch[-1][0]
+                    self.written.notify_all()
+        conn.close()
+
+    def sync(self, timeout: float = HISTORY_SYNC_TIMEOUT):
+        """Wait until every event up to the current state version is committed"""
+        target = data_models.state_version
+        with self.written:
+            self.written.wait_for(lambda: self.written_version >= target, timeout=timeout)
+
+    # --- Queries ---
+
+    def page(
+        self, kind: str, limit: int, after: Optional[int] = None, newer_than: Optional[int] = None,
+    ) -> Tuple[List[Tuple[int, QueueItem]], Optional[int], int]:
+        """Same contract as data_models.history_page"""
+        self.sync()
+        conn = self._reader()
+        total = conn.execute(_COUNT, (kind,)).fetchone()[0]
+        end = total if after is None else max(0, min(after - 1, total))
+        start = max(0, end - limit)
+        if newer_than is not None:
+            start = max(start, min(newer_than, end))
+        rows = conn.execute(_PAGE, (kind, end, start, limit)).fetchall()
+        next_cursor = start + 1 if start > 0 else None
+        return [_item(row) for row in rows], next_cursor, total
+
+    def items(self, kind: str) -> List[QueueItem]:
+        """The whole history, oldest first"""
+        self.sync()
+        return [_item(row)[1] for row in self._reader().execute(_ALL, (kind,))]
+
+    def top_requesters(self, limit: int = STATS_LIMIT, kind: str = "played") -> List[Dict]:
+        self.sync()
+        rows = self._reader().execute(_TOP_REQUESTERS, (kind, limit)).fetchall()
+        return [{"username": username, "songs": songs} for username, songs in rows]
+
+    def most_played(self, limit: int = STATS_LIMIT) -> List[Dict]:
+        self.sync()
+        conn = self._reader()
+        results = []
+        for video_id, plays, last_seq in conn.execute(_MOST_PLAYED, (limit,)).fetchall():
+            title, url = conn.execute(_LATEST_BY_SEQ, (last_seq,)).fetchone()
+            results.append({"video_id": video_id, "title": title, "url": url, "plays": plays})
+        return results
+
+
+# Global history store, attached at startup unless disabled
+history_store = HistoryStore()
@@ -0,0 +1,98 @@
+import threading
+from typing import Dict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared policy for every outbound YouTube request
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+POOL_CONNECTIONS = 4  # Number of distinct hosts to keep pools for
+POOL_MAXSIZE = 16  # Keep-alive connections kept open per host
+PER_HOST_LIMIT = 8  # Concurrent in-flight requests allowed per host
+RETRY_TOTAL = 2
+RETRY_BACKOFF = 0.3  # Sleeps 0.3s, 0.6s, ... between retries
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+_per_host_limit = PER_HOST_LIMIT
+
+
+def _build_session(pool_connections, pool_maxsize, retries, backoff):
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def configure(
+    pool_connections=POOL_CONNECTIONS,
+    pool_maxsize=POOL_MAXSIZE,
+    per_host_limit=PER_HOST_LIMIT,
+    retries=RETRY_TOTAL,
+    backoff=RETRY_BACKOFF,
+):
+    """Rebuild the shared session with new pool, concurrency and retry settings"""
+    global _session, _per_host_limit
+    with _session_lock:
+        old_session = _session
+        _session = _build_session(pool_connections, pool_maxsize, retries, backoff)
+        _per_host_limit = per_host_limit
+        _host_limits.clear()
+    if old_session is not None:
+        old_session.close()
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session(POOL_CONNECTIONS, POOL_MAXSIZE, RETRY_TOTAL, RETRY_BACKOFF)
+        return _session
+
+
+def _host_limit(url) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with _session_lock:
+        limit = _host_limits.get(host)
+        if limit is None:
+            limit = _host_limits[host] = threading.BoundedSemaphore(_per_host_limit)
+        return limit
+
+
+def request(method, url, **kwargs) -> requests.Response:
+    """Issue a request on the pooled keep-alive session, bounded per host.
+
+    The per-host slot is held while the request is sent and its headers are
+    received; streamed bodies are read after the slot is released.
+    """
+    session = get_session()
+    with _host_limit(url):
+        return session.request(method, url, **kwargs)
+
+
+def get(url, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,264 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, Optional
+
+import data_models
+from data_models import (
+    QueueItem,
+    StateEvent,
+    queue_lock,
+    music_playlist,
+    played_history,
+    rejected_history,
+)
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "queue_journal.jsonl"
+SNAPSHOT_FILE = "queue_snapshot.json"
+JOURNAL_FSYNC_INTERVAL = 0.05  # Seconds to collect records before one write + fsync
+JOURNAL_COMPACT_EVERY = 10000  # Records appended before the journal is folded into a snapshot
+
+
+class StateJournal:
+    """Write-ahead journal of queue and history mutations.
+
+    Every state event is appended to a JSON-lines file as a compact record. The
+    listener only puts the event on a queue; a writer thread batches records,
+    writes them and fsyncs once per batch, so mutations never wait on disk.
+    After JOURNAL_COMPACT_EVERY records the current state is written to a
+    snapshot and the journal starts over. Startup loads the snapshot and
+    replays the records after it.
+    """
+
+    def __init__(
+        self,
+        path: str = JOURNAL_FILE,
+        snapshot_path: str = SNAPSHOT_FILE,
+        fsync_interval: float = JOURNAL_FSYNC_INTERVAL,
+        compact_every: int = JOURNAL_COMPACT_EVERY,
+    ):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.pending: "queue.Queue[Optional[StateEvent]]" = queue.Queue()
+        self.file = None
+        self.writer = None
+        self.snapshot_version = 0
+        self.records_since_snapshot = 0
+        self.damaged = False
+
+    # --- Recovery ---
+
+    def recover(self) -> int:
+        """Rebuild the queue and histories from disk. Returns the recovered version.
+
+        Call once at startup, before anything else touches the shared state.
+        """
+        started = time.perf_counter()
+        items: Dict[int, QueueItem] = {}
+        replayed = 0
+        with queue_lock:
+            version = self.snapshot_version = self._load_snapshot(items)
+            for record in self._read_records():
+                if record["v"] <= version:
+                    continue
+                self._apply(record, items)
+                version = record["v"]
+                replayed += 1
+
+            data_models.state_version = version
+            if items:
+                data_models._item_ids = itertools.count(max(items) + 1)
+            data_models.reindex_videos()
+        self.records_since_snapshot = replayed
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(f"Recovered {len(items)} items ({replayed} journal records) in {elapsed:.1f} ms")
+        return version
+
+    def _read_records(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = [line for line in f.read().splitlines() if line]
+        try:
+            # Decoding every record in one call is much faster than line by line
+            return json.loads("[" + ",".join(lines) + "]")
+        except ValueError:
+            pass
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A torn final write; nothing after it can be trusted
+                logger.warning(f"Journal {self.path} ends in a damaged record, ignoring the rest")
+                self.damaged = True
+                break
+        return records
+
+    def _load_snapshot(self, items: Dict[int, QueueItem]) -> int:
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable queue snapshot: {e}")
+            return 0
+        for name, target in (("played", played_history), ("rejected", rejected_history)):
+            for record in snapshot.get(name, []):
+                item = QueueItem(**record)
+                items[item.id] = item
+                target.append(item)
+        for record in snapshot.get("queue", []):
+            item = QueueItem(**record)
+            items[item.id] = item
+            music_playlist.append(item)
+        return snapshot.get("version", 0)
+
+    def _apply(self, record: dict, items: Dict[int, QueueItem]):
+        """Replay one journal record without emitting new events"""
+        kind, item_id, data = record["k"], record["i"], record["d"]
+        if kind == "add":
+            fields = dict(data)
+            before_id = fields.pop("before_id", None)
+            item = items[item_id] = QueueItem(**fields)
+            music_playlist.insert(item, before_id)
+        elif kind == "update":
+            item = items.get(item_id)
+            if item is not None:
+                for name, value in data.items():
+                    setattr(item, name, value)
+                if "duration" in data:
+                    music_playlist.set_duration(item_id, item.duration)
+        elif kind in ("play", "reject"):
+            item = music_playlist.remove(item_id)
+            if item is not None:
+                item.processed_at = data.get("processed_at")
+                (played_history if kind == "play" else rejected_history).append(item)
+        elif kind == "remove":
+            music_playlist.remove(item_id)
+        elif kind == "reorder":
+            direction = data.get("direction")
+            if direction == "up":
+                music_playlist.move_up(item_id)
+            elif direction == "down":
+                music_playlist.move_down(item_id)
+            else:
+                music_playlist.move(item_id, data.get("before_id"))
+
+    # --- Writing ---
+
+    def start(self):
+        """Start journaling new events. Call after recover()."""
+        if self.writer and self.writer.is_alive():
+            return
+        if self.damaged:
+            # Fold the readable part into a snapshot so new records do not follow a torn line
+            self.compact()
+            self.damaged = False
+        self.file = open(self.path, "a", encoding="utf-8")
+        data_models.event_listeners.append(self._on_event)
+        self.writer = threading.Thread(target=self._write_loop, name="journal", daemon=True)
+        self.writer.start()
+
+    def close(self):
+        """Flush outstanding records and stop the writer"""
+        if self.writer is None:
+            return
+        if self._on_event in data_models.event_listeners:
+            data_models.event_listeners.remove(self._on_event)
+        self.pending.put(None)
+        self.writer.join()
+        self.writer = None
+        self.file.close()
+
+    def _on_event(self, event: StateEvent, item: QueueItem):
+        # Runs under queue_lock: hand off and return immediately
+        self.pending.put(event)
+
+    def _write_loop(self):
+        running = True
+        while running:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.fsync_interval
+            while batch[-1] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                running = False
+            try:
+                self._write(batch)
+                if self.records_since_snapshot >= self.compact_every:
+                    self.compact()
+            except OSError as e:
+                logger.error(f"Error writing queue journal: {e}")
+
+    def _write(self, batch):
+        lines = [
+            json.dumps(
+                {"v": event.version, "k": event.kind, "i": event.item_id, "d": event.data},
+                separators=(",", ":"),
+                ensure_ascii=False,
+            )
+            for event in batch
+            # Events queued before the last snapshot are already part of it
+            if event.version > self.snapshot_version
+        ]
+        if not lines:
+            return
+        self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records_since_snapshot += len(lines)
+
+    def compact(self):
+        """Write the current state to the snapshot file and start a fresh journal.
+
+        Runs on the writer thread, or before start().
+        """
+        with queue_lock:
+            version = data_models.state_version
+            queued = music_playlist.snapshot()
+            played = list(played_history)
+            rejected = list(rejected_history)
+        # Serializing outside the lock is safe: any later field change has its
+        # own record with a newer version that is replayed on top
+        snapshot = {
+            "version": version,
+            "queue": [asdict(item) for item in queued],
+            "played": [asdict(item) for item in played],
+            "rejected": [asdict(item) for item in rejected],
+        }
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"), ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self.snapshot_version = version
+        self.records_since_snapshot = 0
+        # Every record written so far is older than the snapshot
+        if self.file is not None:
+            self.file.close()
+            self.file = open(self.path, "w", encoding="utf-8")
+        else:
+            open(self.path, "w", encoding="utf-8").close()
+
+
+# Global journal instance
+state_journal = StateJournal()
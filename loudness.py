@@ -0,0 +1,102 @@
+import logging
+import re
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from metadata_cache import metadata_cache
+from utils import extract_video_id
+
+logger = logging.getLogger(__name__)
+
+LOUDNESS_TARGET = -14.0  # Integrated loudness (LUFS) every track is brought to
+LOUDNESS_MAX_BOOST = 10.0  # dB; quiet tracks are not lifted further, to keep the noise floor down
+LOUDNESS_MAX_CUT = -20.0  # dB
+LOUDNESS_WORKERS = 2
+LOUDNESS_TIMEOUT = 120  # Seconds one analysis may take
+
+_integrated_pattern = re.compile(r"Integrated loudness:\s+I:\s+(-?[\d.]+) LUFS")
+
+
+def measure_loudness(path: str) -> Optional[float]:
+    """Integrated loudness of an audio file in LUFS, using ffmpeg's EBU R128 filter.
+
+    Runs in a worker process, so it must stay a plain module-level function.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+        "-map", "a:0", "-af", "ebur128=framelog=quiet", "-f", "null", "-",
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=LOUDNESS_TIMEOUT)
+    match = _integrated_pattern.search(result.stderr.decode(errors="replace"))
+    # Silence reports -70 LUFS, which would ask for an absurd boost
+    if match is None or float(match.group(1)) <= -70:
+        return None
+    return float(match.group(1))
+
+
+def gain_for(loudness: float) -> float:
+    return max(LOUDNESS_MAX_CUT, min(LOUDNESS_MAX_BOOST, LOUDNESS_TARGET - loudness))
+
+
+def get_gain(video_url: str) -> Optional[float]:
+    """The normalization gain in dB for a video, if it has been measured"""
+    video_id = extract_video_id(video_url)
+    metadata = metadata_cache.get(video_id) if video_id else None
+    return metadata.get("gain") if metadata else None
+
+
+class LoudnessAnalyzer:
+    """Measures downloaded tracks ahead of playback on a process pool.
+
+    Results go into the metadata cache as loudness (LUFS) and gain (dB), so the
+    player only has to look the gain up when the track starts.
+    """
+
+    def __init__(self, workers: int = LOUDNESS_WORKERS):
+        self.workers = workers
+        self.executor = None  # Started on first use so importing stays cheap
+        self.pending = set()
+        self.failed = set()  # Not retried this session
+        self.lock = threading.Lock()
+
+    def schedule(self, video_id: str, path: str):
+        """Measure the file for video_id unless it is already measured or queued"""
+        metadata = metadata_cache.get(video_id)
+        if metadata is None or "gain" in metadata:
+            # Without a cache entry there is nowhere to keep the result yet
+            return
+        with self.lock:
+            if video_id in self.pending or video_id in self.failed:
+                return
+            self.pending.add(video_id)
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            future = self.executor.submit(measure_loudness, path)
+        future.add_done_callback(lambda f: self._store(video_id, f))
+
+    def _store(self, video_id: str, future):
+        try:
+            loudness = future.result()
+        except Exception as e:
+            logger.error(f"Loudness analysis for {video_id} failed: {e}")
+            loudness = None
+        with self.lock:
+            self.pending.discard(video_id)
+            if loudness is None:
+                self.failed.add(video_id)
+        if loudness is None:
+            logger.info(f"No usable loudness for {video_id}, playing it unchanged")
+            return
+        gain = gain_for(loudness)
+        metadata_cache.update(video_id, loudness=loudness, gain=gain)
+        logger.info(f"Measured {video_id}: {loudness:.1f} LUFS, gain {gain:+.1f} dB")
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global analyzer instance
+loudness_analyzer = LoudnessAnalyzer()
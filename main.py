@@ -1,11 +1,90 @@
+import argparse
 import threading
-from flask_app import run_flask
+from flask_app import (
+    run_flask,
+    SERVER_MODE,
+    SERVER_PORT,
+    SERVER_THREADS,
+    SERVER_CONNECTION_LIMIT,
+    SERVER_CHANNEL_TIMEOUT,
+)
 from tui_app import MusicQueueApp
+from prefetcher import stream_prefetcher
+from audio_player import audio_player
+from metadata_cache import metadata_cache
+from journal import state_journal
+from history_store import history_store
+from audio_cache import audio_cache, AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES
+from loudness import loudness_analyzer
+from data_models import (
+    music_playlist,
+    configure_duplicates,
+    DUPLICATE_POLICIES,
+    DUPLICATE_POLICY,
+    REPLAY_WINDOW,
+)
+from title_resolver import title_resolver
+from fair_scheduler import fair_scheduler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Moojik music queue")
+    parser.add_argument("--server", choices=["waitress", "dev"], default=SERVER_MODE,
+                        help="web server to run the guest UI with")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS,
+                        help="worker threads for the waitress server; live-update streams may hold half")
+    parser.add_argument("--connection-limit", type=int, default=SERVER_CONNECTION_LIMIT,
+                        help="maximum simultaneous connections for waitress")
+    parser.add_argument("--timeout", type=int, default=SERVER_CHANNEL_TIMEOUT,
+                        help="seconds before waitress closes an inactive connection")
+    parser.add_argument("--audio-cache-dir", default=AUDIO_CACHE_DIR,
+                        help="directory for downloaded audio")
+    parser.add_argument("--audio-cache-mb", type=int, default=AUDIO_CACHE_MAX_BYTES // 1024 ** 2,
+                        help="disk budget for downloaded audio in MiB, 0 to always stream")
+    parser.add_argument("--duplicates", choices=DUPLICATE_POLICIES, default=DUPLICATE_POLICY,
+                        help="what to do when a guest submits a song that is already queued")
+    parser.add_argument("--replay-window", type=int, default=REPLAY_WINDOW,
+                        help="plays before a song may be queued again, 0 to allow replays")
+    parser.add_argument("--scheduler", choices=["fifo", "fair"], default="fifo",
+                        help="fair takes turns between guests instead of first come, first served")
+    parser.add_argument("--no-history-db", action="store_true",
+                        help="answer history queries from memory instead of the SQLite store")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
+    args = parse_args()
+    server_options = {
+        "mode": args.server,
+        "port": args.port,
+        "threads": args.threads,
+        "connection_limit": args.connection_limit,
+        "channel_timeout": args.timeout,
+    }
+    # Restore the queue and histories before anything can change them
+    state_journal.recover()
+    configure_duplicates(args.duplicates, args.replay_window)
+    if args.scheduler == "fair":
+        fair_scheduler.attach()
+    state_journal.start()
+    if not args.no_history_db:
+        history_store.attach()
+    audio_cache.configure(args.audio_cache_dir, args.audio_cache_mb * 1024 ** 2)
+    for item in music_playlist.snapshot():
+        if item.status == "pending":
+            title_resolver.submit(item)
+
+    flask_thread = threading.Thread(target=run_flask, kwargs=server_options, daemon=True)
     flask_thread.start()
+    stream_prefetcher.start()
 
     tui_app = MusicQueueApp()
-    tui_app.run()
+    try:
+        tui_app.run()
+    finally:
+        audio_player.shutdown()
+        loudness_analyzer.shutdown()
+        metadata_cache.save()
+        state_journal.close()
+        history_store.close()
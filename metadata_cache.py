@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+METADATA_CACHE_FILE = "metadata_cache.json"
+METADATA_CACHE_MAX_ENTRIES = 5000
+METADATA_CACHE_TTL = 7 * 24 * 60 * 60  # Titles rarely change; refresh weekly
+METADATA_CACHE_FLUSH_DELAY = 2.0  # Seconds to batch writes before saving to disk
+
+
+class MetadataCache:
+    """LRU cache of video metadata keyed by video ID, persisted to a JSON file.
+
+    Each entry stores title, channel, duration and thumbnail along with the
+    time it was fetched. Writes are batched onto a timer thread so lookups and
+    inserts never wait on disk I/O.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = METADATA_CACHE_FILE,
+        max_entries: int = METADATA_CACHE_MAX_ENTRIES,
+        ttl: float = METADATA_CACHE_TTL,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.flush_timer = None
+        self.load()
+
+    def get(self, video_id: str) -> Optional[Dict]:
+        """Return the cached metadata for video_id, or None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(video_id)
+            if entry is None:
+                return None
+            if entry["fetched_at"] + self.ttl < time.time():
+                del self.entries[video_id]
+                return None
+            self.entries.move_to_end(video_id)
+            return entry
+
+    def put(self, video_id: str, metadata: Dict):
+        """Store metadata for video_id, evicting the least recently used entries"""
+        entry = dict(metadata)
+        entry["fetched_at"] = time.time()
+        with self.lock:
+            self.entries[video_id] = entry
+            self.entries.move_to_end(video_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._schedule_flush()
+
+    def update(self, video_id: str, **fields):
+        """Merge extra fields into an existing entry without refreshing its TTL"""
+        with self.lock:
+            entry = self.entries.get(video_id)
+            if entry is None:
+                return
+            entry.update(fields)
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.path is None or self.flush_timer is not None:
+            return
+        self.flush_timer = threading.Timer(METADATA_CACHE_FLUSH_DELAY, self.save)
+        self.flush_timer.daemon = True
+        self.flush_timer.start()
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable metadata cache: {e}")
+            return
+        now = time.time()
+        # Entries are stored least recently used first
+        for video_id, entry in data.items():
+            if entry.get("fetched_at", 0) + self.ttl >= now:
+                self.entries[video_id] = entry
+
+    def save(self):
+        """Write the cache to disk atomically"""
+        with self.lock:
+            self.flush_timer = None
+            data = json.dumps(self.entries, separators=(",", ":"), ensure_ascii=False)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving metadata cache: {e}")
+
+
+# Global metadata cache instance
+metadata_cache = MetadataCache()
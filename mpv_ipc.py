@@ -0,0 +1,208 @@
+import json
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MPV_STARTUP_TIMEOUT = 5.0  # Seconds to wait for the IPC socket to appear
+MPV_STOP_TIMEOUT = 2.0  # Seconds an old mpv gets to exit before it is killed
+
+
+class MpvIpcError(Exception):
+    pass
+
+
+class MpvIpcPlayer:
+    """A single long-lived mpv process controlled over its JSON IPC socket."""
+
+    def __init__(self, extra_args: Optional[List[str]] = None):
+        self.extra_args = extra_args or []
+        self.socket_path = os.path.join(tempfile.gettempdir(), f"moojik-mpv-{os.getpid()}.sock")
+        self.process = None
+        self.sock = None
+        self.lock = threading.Lock()
+        self.request_id = 0
+        self.responses: Dict[int, dict] = {}
+        self.response_cond = threading.Condition()
+        self.reader_thread = None
+        self.position: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.playing = False
+        self.on_track_end: Optional[Callable[[str], None]] = None
+        self.on_position: Optional[Callable[[float], None]] = None
+
+    def ensure_running(self):
+        """Start mpv (or restart it if it died) and connect to its IPC socket"""
+        with self.lock:
+            if self.process and self.process.poll() is None and self.sock:
+                return
+            self._start()
+
+    def _start(self):
+        # The socket can drop while mpv lives on; never leave two players running
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        self._stop_process()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        cmd = [
+            'mpv',
+            '--idle=yes',
+            '--no-video',
+            '--force-window=yes',
+            '--keep-open=no',
+            f'--input-ipc-server={self.socket_path}',
+        ] + self.extra_args
+        logger.info("Starting persistent MPV instance")
+        self.process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.time() + MPV_STARTUP_TIMEOUT
+        while True:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.socket_path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.time() > deadline or self.process.poll() is not None:
+                    raise MpvIpcError("MPV IPC socket did not become available")
+                time.sleep(0.05)
+
+        self.sock = sock
+        self.reader_thread = threading.Thread(target=self._read_events, args=(sock,), daemon=True)
+        self.reader_thread.start()
+        self._send(["observe_property", 1, "time-pos"])
+        self._send(["observe_property", 2, "duration"])
+
+    def _stop_process(self):
+        if self.process and self.process.poll() is None:
+            logger.info("Stopping unreachable MPV instance")
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=MPV_STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def _send(self, command: list) -> int:
+        self.request_id += 1
+        payload = json.dumps({"command": command, "request_id": self.request_id}) + "\n"
+        self.sock.sendall(payload.encode("utf-8"))
+        return self.request_id
+
+    def command(self, *args, timeout: float = 2.0):
+        """Send a command and wait for mpv's reply, returning its data field"""
+        self.ensure_running()
+        with self.lock:
+            request_id = self._send(list(args))
+        with self.response_cond:
+            self.response_cond.wait_for(lambda: request_id in self.responses, timeout=timeout)
+            response = self.responses.pop(request_id, None)
+        if response is None:
+            raise MpvIpcError(f"No reply from MPV for {args[0]}")
+        if response.get("error") != "success":
+            raise MpvIpcError(f"MPV {args[0]} failed: {response.get('error')}")
+        return response.get("data")
+
+    def _read_events(self, sock: socket.socket):
+        buffer = b""
+        while True:
+            try:
+                chunk = sock.recv(4096)
+            except OSError:
+                break
+            if not chunk:
+                break
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                self._handle_message(message)
+
+        logger.info("MPV IPC connection closed")
+        with self.lock:
+            if self.sock is sock:
+                self.sock = None
+
+    def _handle_message(self, message: dict):
+        if "event" not in message:
+            if message.get("request_id") is None:
+                return
+            with self.response_cond:
+                self.responses[message["request_id"]] = message
+                self.response_cond.notify_all()
+            return
+
+        event = message.get("event")
+        if event == "start-file":
+            self.playing = True
+        elif event == "property-change":
+            if message.get("name") == "time-pos":
+                self.position = message.get("data")
+                if self.on_position and self.position is not None:
+                    self.on_position(self.position)
+            elif message.get("name") == "duration":
+                self.duration = message.get("data")
+        elif event == "end-file":
+            self.playing = False
+            self.position = None
+            self.duration = None
+            if self.on_track_end:
+                # reason is "eof", "stop", "quit", "error" or "redirect".
+                # Dispatch off the reader thread so the handler may send commands.
+                threading.Thread(
+                    target=self.on_track_end, args=(message.get("reason", ""),), daemon=True
+                ).start()
+
+    def loadfile(self, url: str):
+        """Play url now, replacing whatever plays.
+
+        Tracks are loaded one at a time rather than appended to mpv's playlist,
+        so mpv does not play them gaplessly. Until the current track ends the
+        host can still reorder or reject the next song, the fair scheduler can
+        put a new one in front of it, and autoplay can be switched off, any of
+        which would leave a preloaded entry playing the wrong song. The stream
+        prefetcher resolves the next URL ahead of time instead, so the gap is
+        only mpv opening the stream.
+        """
+        self.command("loadfile", url, "replace")
+
+    def set_property(self, name: str, value):
+        self.command("set_property", name, value)
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.is_running():
+            self.command("stop")
+
+    def shutdown(self):
+        with self.lock:
+            if self.sock:
+                try:
+                    self._send(["quit"])
+                except OSError:
+                    pass
+                self.sock.close()
+                self.sock = None
+            if self.process and self.process.poll() is None:
+                try:
+                    self.process.wait(timeout=2)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
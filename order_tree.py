@@ -0,0 +1,197 @@
+import random
+from typing import Callable, Iterator, Optional, Tuple
+
+
+class TreeNode:
+    """One entry of an OrderTree: a value, its weight and its place in the tree"""
+
+    __slots__ = ("value", "weight", "prev", "next", "left", "right", "parent", "priority", "size", "total")
+
+    def __init__(self, value, weight: float = 0.0):
+        self.value = value
+        self.weight = weight
+        self.prev: Optional["TreeNode"] = None
+        self.next: Optional["TreeNode"] = None
+        self.left: Optional["TreeNode"] = None
+        self.right: Optional["TreeNode"] = None
+        self.parent: Optional["TreeNode"] = None
+        self.priority = 0.0
+        self.size = 1
+        self.total = weight
+
+
+def _size(node: Optional[TreeNode]) -> int:
+    return node.size if node else 0
+
+
+def _total(node: Optional[TreeNode]) -> float:
+    return node.total if node else 0
+
+
+def _pull(node: TreeNode):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    node.total = node.weight + _total(node.left) + _total(node.right)
+
+
+class OrderTree:
+    """A sequence of nodes held in a treap keyed by position.
+
+    Every node also sits in a doubly linked list, so the ends and each
+    node's neighbours are O(1) and iteration is a plain walk. Inserting
+    before a node, removing one, changing a weight, and reading how many
+    nodes and how much weight come before a node are O(log n) expected,
+    as the random priorities keep the tree balanced whatever the order of
+    operations.
+    """
+
+    def __init__(self):
+        self.root: Optional[TreeNode] = None
+        self.head: Optional[TreeNode] = None
+        self.tail: Optional[TreeNode] = None
+
+    def __len__(self) -> int:
+        return _size(self.root)
+
+    def __iter__(self) -> Iterator[TreeNode]:
+        node = self.head
+        while node:
+            yield node
+            node = node.next
+
+    def insert_before(self, node: TreeNode, before: Optional[TreeNode] = None):
+        """Insert a detached node in front of before, or at the end when before is None"""
+        node.left = node.right = None
+        node.size = 1
+        node.total = node.weight
+        node.priority = random.random()
+        # The node becomes a leaf next to its in-order neighbour, then rises by priority
+        if before is None:
+            parent, on_left = self.tail, False
+            node.prev, node.next = self.tail, None
+        elif before.left is None:
+            parent, on_left = before, True
+            node.prev, node.next = before.prev, before
+        else:
+            # The predecessor is the rightmost node of before's left subtree
+            parent, on_left = before.prev, False
+            node.prev, node.next = before.prev, before
+        if node.prev:
+            node.prev.next = node
+        else:
+            self.head = node
+        if node.next:
+            node.next.prev = node
+        else:
+            self.tail = node
+
+        node.parent = parent
+        if parent is None:
+            self.root = node
+        elif on_left:
+            parent.left = node
+        else:
+            parent.right = node
+        while node.parent and node.parent.priority < node.priority:
+            self._rotate_up(node)
+        self._pull_up(node.parent)
+
+    def remove(self, node: TreeNode):
+        """Take a node out of the tree"""
+        # Sink the node until it has at most one child, then splice it out
+        while node.left and node.right:
+            child = node.left if node.left.priority > node.right.priority else node.right
+            self._rotate_up(child)
+        child = node.left or node.right
+        parent = node.parent
+        if child:
+            child.parent = parent
+        if parent is None:
+            self.root = child
+        elif parent.left is node:
+            parent.left = child
+        else:
+            parent.right = child
+        self._pull_up(parent)
+
+        if node.prev:
+            node.prev.next = node.next
+        else:
+            self.head = node.next
+        if node.next:
+            node.next.prev = node.prev
+        else:
+            self.tail = node.prev
+        node.prev = node.next = node.left = node.right = node.parent = None
+
+    def set_weight(self, node: TreeNode, weight: float):
+        node.weight = weight
+        self._pull_up(node)
+
+    def rank(self, node: TreeNode) -> Tuple[int, float]:
+        """Number of nodes before node and the sum of their weights"""
+        count = _size(node.left)
+        weight = _total(node.left)
+        while node.parent:
+            parent = node.parent
+            if parent.right is node:
+                count += _size(parent.left) + 1
+                weight += _total(parent.left) + parent.weight
+            node = parent
+        return count, weight
+
+    def at(self, index: int) -> TreeNode:
+        """The node at a zero-based position, which must be in range"""
+        node = self.root
+        while True:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node
+            else:
+                index -= left + 1
+                node = node.right
+
+    def first_where(self, predicate: Callable[[object], bool]) -> Optional[TreeNode]:
+        """First node whose value satisfies predicate, which must hold for a suffix of the sequence"""
+        found = None
+        node = self.root
+        while node:
+            if predicate(node.value):
+                found = node
+                node = node.left
+            else:
+                node = node.right
+        return found
+
+    def clear(self):
+        self.root = self.head = self.tail = None
+
+    def _rotate_up(self, node: TreeNode):
+        parent = node.parent
+        grandparent = parent.parent
+        if parent.left is node:
+            parent.left = node.right
+            if node.right:
+                node.right.parent = parent
+            node.right = parent
+        else:
+            parent.right = node.left
+            if node.left:
+                node.left.parent = parent
+            node.left = parent
+        parent.parent = node
+        node.parent = grandparent
+        if grandparent is None:
+            self.root = node
+        elif grandparent.left is parent:
+            grandparent.left = node
+        else:
+            grandparent.right = node
+        _pull(parent)
+        _pull(node)
+
+    def _pull_up(self, node: Optional[TreeNode]):
+        while node:
+            _pull(node)
+            node = node.parent
@@ -0,0 +1,261 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from data_models import QueueItem, submit_items
+from metadata_cache import metadata_cache
+from title_resolver import FAILED_TITLE
+from utils import get_youtube_metadata
+from youtube_url import parse_youtube_url
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FILE = "played_playlist.json"  # Written by the TUI export, readable by the import
+IMPORT_WORKERS = 8  # Metadata lookups in flight at once across all imports
+IMPORT_MAX_ITEMS = 300  # Tracks taken from one import; the rest are skipped
+IMPORT_JOBS_KEPT = 50  # Finished jobs whose progress can still be read
+PLAYLIST_URL = "https://www.youtube.com/playlist?list={}"
+
+
+def _export_title(entry: Dict) -> Optional[str]:
+    # Inverse of the "Artist - Song" split done by the export
+    song = entry.get("song") or entry.get("title")
+    artist = entry.get("artist")
+    if song and artist and artist != "Unknown Artist":
+        return f"{artist} - {song}"
+    return song
+
+
+def expand_playlist(playlist_id: str) -> List[Tuple[str, Optional[str]]]:
+    """(url, title) of every video in a YouTube playlist, listed without visiting each video.
+
+    Titles and durations from the listing are put in the metadata cache, so
+    most tracks need no lookup of their own afterwards.
+    """
+    import yt_dlp
+
+    ydl_opts = {"quiet": True, "no_warnings": True, "extract_flat": "in_playlist"}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(PLAYLIST_URL.format(playlist_id), download=False)
+    entries = []
+    for entry in info.get("entries") or []:
+        video_id = entry.get("id")
+        if not video_id:
+            continue
+        title = entry.get("title")
+        if title and entry.get("duration") and metadata_cache.get(video_id) is None:
+            metadata_cache.put(video_id, {
+                "title": title,
+                "channel": entry.get("channel") or entry.get("uploader"),
+                "duration": entry.get("duration"),
+                "thumbnail": None,
+            })
+        entries.append((f"https://www.youtube.com/watch?v={video_id}", title))
+    return entries
+
+
+def parse_import(text: str) -> Tuple[List[Tuple[str, Optional[str]]], int]:
+    """Read an import into (url, title) entries, plus the number of lines skipped.
+
+    Accepts our exported JSON (a list of {"song", "artist", "url"}, or the
+    web queue download), or one URL per line, where playlist links are
+    expanded into their videos. Raises ValueError for JSON that is not an export.
+    """
+    text = text.strip()
+    if text.startswith(("[", "{")):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            # The web queue download
+            data = data.get("playlist")
+        if not isinstance(data, list):
+            raise ValueError("Expected a list of songs")
+        entries, skipped = [], 0
+        for entry in data:
+            if isinstance(entry, str):
+                entry = {"url": entry}
+            url = entry.get("url") if isinstance(entry, dict) else None
+            parsed = parse_youtube_url(url) if isinstance(url, str) else None
+            if parsed and parsed.video_id:
+                entries.append((url, _export_title(entry)))
+            else:
+                skipped += 1
+        return entries, skipped
+
+    entries, skipped = [], 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parsed = parse_youtube_url(line)
+        if parsed is None:
+            skipped += 1
+        elif parsed.video_id:
+            entries.append((line, None))
+        else:
+            try:
+                entries.extend(expand_playlist(parsed.playlist_id))
+            except Exception as e:
+                logger.error(f"Listing playlist {parsed.playlist_id} failed: {e}")
+                skipped += 1
+    return entries, skipped
+
+
+class ImportJob:
+    """Progress of one import, readable while it runs"""
+
+    def __init__(self, job_id: int, username: str, ip: str):
+        self.id = job_id
+        self.username = username
+        self.ip = ip
+        self.state = "reading"  # then "resolving", "done" or "failed"
+        self.total = 0
+        self.resolved = 0
+        self.skipped = 0
+        self.limited = 0  # Left out because the submitter ran out of songs
+        self.added = 0
+        self.duplicates = 0
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def progress(self) -> Dict:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "total": self.total,
+            "resolved": self.resolved,
+            "added": self.added,
+            "duplicates": self.duplicates,
+            "skipped": self.skipped,
+            "limited": self.limited,
+            "error": self.error,
+        }
+
+
+class PlaylistImporter:
+    """Bulk imports: looks up metadata for every track in parallel, then queues them in one go.
+
+    Lookups run on a pool shared by all imports, so a few large imports
+    cannot flood YouTube; cached tracks skip the pool entirely. Once every
+    track is resolved the batch is queued under a single lock acquisition,
+    through the same duplicate check as single submissions.
+    """
+
+    def __init__(self, workers: int = IMPORT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="importer")
+        self.jobs: Dict[int, ImportJob] = {}
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def start(
+        self,
+        text: str,
+        username: str,
+        ip: str,
+        on_progress: Optional[Callable[[ImportJob], None]] = None,
+        quota: Optional[Callable[[int], int]] = None,
+    ) -> ImportJob:
+        """Run an import in the background and return its job for progress polling"""
+        job = self._new_job(username, ip)
+        threading.Thread(
+            target=self.run, args=(job, text, on_progress, quota), name=f"import-{job.id}", daemon=True,
+        ).start()
+        return job
+
+    def get(self, job_id: int) -> Optional[ImportJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _new_job(self, username: str, ip: str) -> ImportJob:
+        with self.lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+            for job_id in finished[:max(0, len(finished) - IMPORT_JOBS_KEPT + 1)]:
+                del self.jobs[job_id]
+            job = ImportJob(next(self.job_ids), username, ip)
+            self.jobs[job.id] = job
+        return job
+
+    def run(
+        self,
+        job: ImportJob,
+        text: str,
+        on_progress: Optional[Callable[[ImportJob], None]] = None,
+        quota: Optional[Callable[[int], int]] = None,
+    ) -> ImportJob:
+        """Import text into the queue, reporting on job as it goes. Blocks until done.
+
+        quota, if given, is asked how many of the tracks may be queued and
+        charged for them; the rest are left out, as with single submissions
+        past the rate limit.
+        """
+        try:
+            entries, job.skipped = parse_import(text)
+            if len(entries) > IMPORT_MAX_ITEMS:
+                job.skipped += len(entries) - IMPORT_MAX_ITEMS
+                entries = entries[:IMPORT_MAX_ITEMS]
+            if quota is not None and entries:
+                allowed = quota(len(entries))
+                job.limited = len(entries) - allowed
+                entries = entries[:allowed]
+                if not entries:
+                    raise ValueError("You've added plenty of songs, try again in a bit.")
+            job.total = len(entries)
+            job.state = "resolving"
+            if on_progress:
+                on_progress(job)
+
+            metadata: List[Optional[Dict]] = [None] * len(entries)
+            futures = {}
+            for index, (url, _) in enumerate(entries):
+                video_id = parse_youtube_url(url).video_id
+                metadata[index] = metadata_cache.get(video_id)
+                if metadata[index] is None:
+                    futures[self.executor.submit(get_youtube_metadata, url)] = index
+            job.resolved = len(entries) - len(futures)
+            for future in as_completed(futures):
+                try:
+                    metadata[futures[future]] = future.result()
+                except Exception as e:
+                    logger.error(f"Resolving {entries[futures[future]][0]} failed: {e}")
+                job.resolved += 1
+                if on_progress:
+                    on_progress(job)
+
+            items = [
+                self._item(job, url, title, found)
+                for (url, title), found in zip(entries, metadata)
+            ]
+            outcomes = submit_items(items)
+            job.added = sum(1 for outcome, _ in outcomes if outcome == "added")
+            job.duplicates = len(outcomes) - job.added
+            job.state = "done"
+        except Exception as e:
+            logger.error(f"Import {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = "failed"
+        job.finished_at = time.time()
+        if on_progress:
+            on_progress(job)
+        return job
+
+    def _item(self, job: ImportJob, url: str, title: Optional[str], metadata: Optional[Dict]) -> QueueItem:
+        item = QueueItem(url=url, title=title or FAILED_TITLE, ip=job.ip, username=job.username)
+        if metadata:
+            item.title = title or metadata["title"]
+            item.duration = metadata.get("duration")
+        elif not title:
+            # Keep the track so the host can still judge it by its URL
+            item.status = "failed"
+        return item
+
+
+# Global importer instance
+playlist_importer = PlaylistImporter()
@@ -0,0 +1,156 @@
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import yt_dlp
+
+from data_models import queue_lock, music_playlist
+from utils import extract_video_id
+from audio_cache import audio_cache, AUDIO_CACHE_AHEAD
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_AHEAD = 3  # Number of upcoming queue items to resolve ahead of time
+PREFETCH_WORKERS = 2
+PREFETCH_POLL_INTERVAL = 1.0  # Seconds between queue scans
+DEFAULT_URL_LIFETIME = 60 * 60  # Used when the signed URL carries no 'expire' param
+EXPIRY_MARGIN = 5 * 60  # Treat URLs as stale this many seconds before they expire
+
+
+def resolve_audio_url(video_url: str) -> str:
+    """Resolves the direct bestaudio stream URL for a YouTube video using yt-dlp."""
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(video_url, download=False)
+        return info['url']
+
+
+def get_url_expiry(audio_url: str) -> float:
+    """Returns the epoch time a signed googlevideo URL stops being valid."""
+    try:
+        expire = parse_qs(urlparse(audio_url).query).get('expire')
+        if expire:
+            return float(expire[0])
+    except ValueError:
+        pass
+    return time.time() + DEFAULT_URL_LIFETIME
+
+
+class StreamPrefetcher:
+    """Resolves stream URLs for upcoming queue entries on a bounded worker pool."""
+
+    def __init__(self, ahead: int = PREFETCH_AHEAD, workers: int = PREFETCH_WORKERS):
+        self.ahead = ahead
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.cache: Dict[str, Tuple[str, float]] = {}  # video_id -> (audio_url, expires_at)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the background thread that watches the queue"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch_queue, daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch_queue(self):
+        while not self._stop.is_set():
+            try:
+                self.prefetch_upcoming()
+            except Exception as e:
+                logger.error(f"Prefetch scan failed: {e}")
+            self._stop.wait(PREFETCH_POLL_INTERVAL)
+
+    def prefetch_upcoming(self):
+        """Schedule resolution for the next N queue entries that are not cached yet."""
+        with queue_lock:
+            upcoming = [item.url for item in music_playlist.peek(self.ahead)]
+        with self.lock:
+            # Drop expired entries so the cache does not grow over a long night
+            for video_id in list(self.cache):
+                self._fresh_entry(video_id)
+        for url in upcoming:
+            self.schedule(url)
+        # Download the next few to disk so they play without touching the network
+        for url in upcoming[:AUDIO_CACHE_AHEAD]:
+            audio_cache.schedule(url)
+
+    def schedule(self, video_url: str):
+        video_id = extract_video_id(video_url)
+        if not video_id:
+            return
+        if video_id in audio_cache:
+            return  # Plays from disk, no stream URL needed
+        with self.lock:
+            if video_id in self.pending or self._fresh_entry(video_id):
+                return
+            self.pending.add(video_id)
+        self.executor.submit(self._resolve, video_id, video_url)
+
+    def _resolve(self, video_id: str, video_url: str):
+        try:
+            audio_url = resolve_audio_url(video_url)
+            with self.lock:
+                self.cache[video_id] = (audio_url, get_url_expiry(audio_url))
+            logger.info(f"Prefetched stream URL for {video_id}")
+        except Exception as e:
+            logger.error(f"Prefetch failed for {video_id}: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard(video_id)
+
+    def _fresh_entry(self, video_id: str) -> Optional[str]:
+        entry = self.cache.get(video_id)
+        if entry is None:
+            return None
+        audio_url, expires_at = entry
+        if expires_at - EXPIRY_MARGIN <= time.time():
+            del self.cache[video_id]
+            return None
+        return audio_url
+
+    def get_audio_url(self, video_url: str) -> str:
+        """Return a cached local file or a prefetched stream URL, otherwise resolve it synchronously."""
+        video_id = extract_video_id(video_url)
+        if video_id:
+            local_path = audio_cache.get_path(video_id)
+            if local_path:
+                return local_path
+            # Stream this time, keep a copy for the next time it is requested
+            audio_cache.schedule(video_url)
+            with self.lock:
+                audio_url = self._fresh_entry(video_id)
+                if audio_url:
+                    self.hits += 1
+                    return audio_url
+                self.misses += 1
+        return resolve_audio_url(video_url)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for confirming gapless transitions"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "cached": len(self.cache),
+                "pending": len(self.pending),
+            }
+
+
+# Global prefetcher instance
+stream_prefetcher = StreamPrefetcher()
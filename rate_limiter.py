@@ -0,0 +1,74 @@
+import math
+import threading
+import time
+from typing import Dict, List, Tuple
+
+SUBMIT_RATE = 1 / 60  # Songs per second each guest earns back: one a minute
+SUBMIT_BURST = 5  # Songs a guest can add back to back
+SEARCH_RATE = 0.5  # Searches per second per guest
+SEARCH_BURST = 10
+IMPORT_RATE = 1 / 600  # Playlist imports per second per guest: one every ten minutes
+IMPORT_BURST = 1
+PRUNE_INTERVAL = 300  # Seconds between sweeps of idle buckets
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by client, e.g. "ip:10.0.0.7" or "user:kevin".
+
+    Each bucket holds up to burst tokens and refills at rate tokens per
+    second. A request takes one token from every key it is charged to, or
+    from none of them if any bucket is empty.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+        self.lock = threading.Lock()
+        self.last_prune = time.monotonic()
+
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, updated_at = self.buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def acquire(self, keys: List[str]) -> Tuple[bool, float]:
+        """Take a token for every key. Returns (allowed, seconds until a retry can succeed)."""
+        now = time.monotonic()
+        with self.lock:
+            tokens = {key: self._tokens(key, now) for key in keys}
+            short = max(1 - available for available in tokens.values())
+            if short > 0:
+                return False, short / self.rate
+            for key, available in tokens.items():
+                self.buckets[key] = (available - 1, now)
+            if now - self.last_prune > PRUNE_INTERVAL:
+                self._prune(now)
+        return True, 0.0
+
+    def acquire_up_to(self, keys: List[str], wanted: int) -> int:
+        """Take up to wanted tokens from every key, as many as all of them hold. Returns how many."""
+        now = time.monotonic()
+        with self.lock:
+            tokens = {key: self._tokens(key, now) for key in keys}
+            granted = max(0, min(wanted, math.floor(min(tokens.values()))))
+            if granted:
+                for key, available in tokens.items():
+                    self.buckets[key] = (available - granted, now)
+        return granted
+
+    def _prune(self, now: float):
+        # A full bucket is the same as no bucket
+        for key in [key for key in self.buckets if self._tokens(key, now) >= self.burst]:
+            del self.buckets[key]
+        self.last_prune = now
+
+
+def retry_after(seconds: float) -> str:
+    """Retry-After header value, in whole seconds"""
+    return str(max(1, math.ceil(seconds)))
+
+
+# Global limiters for the guest web API
+submit_limiter = TokenBucketLimiter(SUBMIT_RATE, SUBMIT_BURST)
+search_limiter = TokenBucketLimiter(SEARCH_RATE, SEARCH_BURST)
+import_limiter = TokenBucketLimiter(IMPORT_RATE, IMPORT_BURST)
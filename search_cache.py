@@ -0,0 +1,128 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils import perform_youtube_search
+
+SEARCH_CACHE_MAX_ENTRIES = 500
+SEARCH_CACHE_TTL = 15 * 60  # Search rankings drift, so keep results for 15 minutes
+SEARCH_SUGGESTION_LIMIT = 10
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases a query and collapses whitespace so equivalent searches share a key."""
+    return " ".join(query.lower().split())
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.results: List[Dict[str, str]] = []
+        self.error: Optional[BaseException] = None
+
+
+class SearchCache:
+    """TTL + LRU cache of search results with in-flight coalescing and a prefix index.
+
+    Concurrent identical queries share one outbound fetch: the first caller
+    performs it and every other caller waits for its result.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], List[Dict[str, str]]],
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = SEARCH_CACHE_TTL,
+    ):
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[List[Dict[str, str]], float]]" = OrderedDict()
+        self.sorted_keys: List[str] = []  # Prefix index over cached queries
+        self.in_flight: Dict[str, _InFlight] = {}
+        self.lock = threading.Lock()
+
+    def search(self, query: str) -> List[Dict[str, str]]:
+        key = normalize_query(query)
+        with self.lock:
+            results = self._get(key)
+            if results is not None:
+                return results
+            pending = self.in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self.in_flight[key] = _InFlight()
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.results
+
+        try:
+            pending.results = self.fetch(key)
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self.lock:
+                # Empty results usually mean a scrape failure; let the next search retry
+                if pending.error is None and pending.results:
+                    self._put(key, pending.results)
+                del self.in_flight[key]
+            pending.done.set()
+        return pending.results
+
+    def suggest(self, prefix: str, limit: int = SEARCH_SUGGESTION_LIMIT) -> Dict[str, list]:
+        """Return cached queries starting with prefix and their de-duplicated results"""
+        prefix = normalize_query(prefix)
+        queries, results, seen_urls = [], [], set()
+        if not prefix:
+            return {"queries": queries, "results": results}
+        now = time.time()
+        with self.lock:
+            start = bisect.bisect_left(self.sorted_keys, prefix)
+            for key in self.sorted_keys[start:]:
+                if not key.startswith(prefix) or len(queries) >= limit:
+                    break
+                cached, expires_at = self.entries[key]
+                if expires_at < now:
+                    continue
+                queries.append(key)
+                for result in cached:
+                    if result["url"] not in seen_urls and len(results) < limit:
+                        seen_urls.add(result["url"])
+                        results.append(result)
+        return {"queries": queries, "results": results}
+
+    def _get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        results, expires_at = entry
+        if expires_at < time.time():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return results
+
+    def _put(self, key: str, results: List[Dict[str, str]]):
+        if key not in self.entries:
+            bisect.insort(self.sorted_keys, key)
+        self.entries[key] = (results, time.time() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+
+    def _remove(self, key: str):
+        del self.entries[key]
+        index = bisect.bisect_left(self.sorted_keys, key)
+        if index < len(self.sorted_keys) and self.sorted_keys[index] == key:
+            del self.sorted_keys[index]
+
+
+# Global search cache shared by the web API and the TUI
+youtube_search_cache = SearchCache(perform_youtube_search)
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import mpv_ipc
+from audio_player import AudioPlayer
+from mpv_ipc import MpvIpcError, MpvIpcPlayer
+
+
+def test_replaced_track_end_keeps_new_track_playing():
+    player = AudioPlayer(use_ipc=False)
+    player.mpv = SimpleNamespace(playing=False, position=10.0, duration=200.0)
+    player.is_playing = True  # The replacement has started
+
+    # The "stop" of the replaced track arrives late, on its own thread
+    player._on_track_end("stop")
+
+    assert player.is_currently_playing()
+    assert player.get_remaining() == 190.0
+
+
+def test_finished_track_plays_next():
+    played = []
+    player = AudioPlayer(use_ipc=False)
+    player.mpv = SimpleNamespace(playing=False, position=None, duration=None)
+    player.is_playing = True
+    player.completion_callback = lambda: played.append(True)
+
+    player._on_track_end("eof")
+
+    assert not player.is_currently_playing()
+    assert played == [True]
+
+
+def test_restart_stops_the_old_mpv(monkeypatch):
+    player = MpvIpcPlayer()
+    old = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    player.process = old  # Alive, but its IPC socket is gone
+    monkeypatch.setattr(mpv_ipc.subprocess, "Popen", lambda *args, **kwargs: SimpleNamespace(poll=lambda: 1))
+    try:
+        with pytest.raises(MpvIpcError):
+            player.ensure_running()
+        assert old.poll() is not None
+    finally:
+        if old.poll() is None:
+            old.kill()
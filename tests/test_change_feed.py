@@ -0,0 +1,16 @@
+import data_models
+import flask_app
+from data_models import QueueItem
+
+
+def test_change_feed_hides_guest_ip():
+    since = data_models.state_version
+    item = data_models.add_item(QueueItem(
+        url="https://youtu.be/R_rUYuFtNO4", title="Red", ip="192.168.1.23", username="amy",
+    ))
+    try:
+        events = flask_app.flask_app.test_client().get(f"/api/changes?since={since}").get_json()["events"]
+        assert [event["data"]["username"] for event in events] == ["amy"]
+        assert "ip" not in events[0]["data"]
+    finally:
+        data_models.remove_item(item.id)
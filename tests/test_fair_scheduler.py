@@ -0,0 +1,36 @@
+import data_models
+from data_models import QueueItem, music_playlist
+from fair_scheduler import FairShareScheduler
+from journal import StateJournal
+
+
+def empty_queue():
+    while music_playlist.popleft() is not None:
+        pass
+
+
+def submit(n, ip):
+    return data_models.add_item(QueueItem(url=f"https://youtu.be/{n:011d}", title=str(n), ip=ip, username=ip))
+
+
+def test_flood_is_interleaved_and_survives_replay(tmp_path):
+    empty_queue()
+    scheduler = FairShareScheduler()
+    scheduler.attach()
+    paths = (str(tmp_path / "journal.jsonl"), str(tmp_path / "snapshot.json"))
+    journal = StateJournal(*paths)
+    journal.start()
+    try:
+        flood = [submit(n, "flooder") for n in range(4)]
+        guest = [submit(10 + n, "guest") for n in range(2)]
+        expected = [flood[0], guest[0], flood[1], guest[1], flood[2], flood[3]]
+        assert music_playlist.snapshot() == expected
+        journal.close()
+
+        empty_queue()
+        StateJournal(*paths).recover()
+        assert [item.id for item in music_playlist.snapshot()] == [item.id for item in expected]
+    finally:
+        data_models.queue_scheduler = None
+        data_models.event_listeners.remove(scheduler._on_event)
+        empty_queue()
@@ -0,0 +1,26 @@
+import data_models
+from data_models import QueueItem, music_playlist
+from journal import StateJournal
+
+
+def empty_queue():
+    while music_playlist.popleft() is not None:
+        pass
+
+
+def test_recovered_queue_keeps_real_durations(tmp_path):
+    empty_queue()
+    paths = (str(tmp_path / "journal.jsonl"), str(tmp_path / "snapshot.json"))
+    journal = StateJournal(*paths)
+    journal.start()
+    first = data_models.add_item(QueueItem(url="https://youtu.be/aaaaaaaaaaa", title="A", ip="ip", username="u"))
+    second = data_models.add_item(QueueItem(url="https://youtu.be/bbbbbbbbbbb", title="B", ip="ip", username="u"))
+    data_models.update_item(first, duration=30.0)
+    journal.close()
+    assert music_playlist.seconds_before(second.id) == 30.0
+
+    empty_queue()
+    StateJournal(*paths).recover()
+    assert music_playlist.get(first.id).duration == 30.0
+    assert music_playlist.seconds_before(second.id) == 30.0
+    empty_queue()
@@ -0,0 +1,30 @@
+import http_client
+import utils
+
+# Shaped like a watch page: the video's own itemprop="name" comes before the author's
+WATCH_PAGE = b"""<!DOCTYPE html><html><head>
+<title>Song - YouTube</title>
+<meta property="og:title" content="Song &amp; Dance">
+<meta property="og:image" content="https://i.ytimg.com/vi/abc/hqdefault.jpg">
+<meta itemprop="name" content="Song &amp; Dance">
+<meta itemprop="duration" content="PT3M20S">
+</head><body>
+<span itemprop="author" itemscope itemtype="http://schema.org/Person">
+<link itemprop="url" href="http://www.youtube.com/@real"><link itemprop="name" content="Real Channel">
+</span>
+</body></html>"""
+
+
+class FakeResponse:
+    status_code = 200
+    text = WATCH_PAGE.decode()
+
+
+def test_scan_matches_full_parse(monkeypatch):
+    monkeypatch.setattr(http_client, "get", lambda url, **kwargs: FakeResponse())
+    full = utils.fetch_youtube_metadata_full("https://www.youtube.com/watch?v=abcdefghijk")
+
+    scanned = utils.scan_metadata(WATCH_PAGE)
+
+    assert scanned == {name: full[name] for name in utils.METADATA_PATTERNS}
+    assert scanned["channel"] == "Real Channel"
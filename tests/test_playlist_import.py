@@ -0,0 +1,43 @@
+import time
+
+import data_models
+import flask_app
+import playlist_import
+from rate_limiter import SUBMIT_BURST
+
+
+def wait_for(client, job_id):
+    for _ in range(100):
+        job = client.get(f"/api/import_playlist/{job_id}").get_json()
+        if job["state"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("import did not finish")
+
+
+def test_web_import_is_charged_per_song(monkeypatch):
+    monkeypatch.setattr(playlist_import, "get_youtube_metadata", lambda url: {"title": url, "duration": 60})
+    client = flask_app.flask_app.test_client()
+    urls = "\n".join(f"https://youtu.be/imp{i:08d}" for i in range(20))
+    response = client.post(
+        "/api/import_playlist",
+        data={"username": "importer", "playlist": urls},
+        environ_base={"REMOTE_ADDR": "10.9.9.1"},
+    )
+    assert response.status_code == 202
+    job = wait_for(client, response.get_json()["job_id"])
+    try:
+        assert (job["added"], job["limited"]) == (SUBMIT_BURST, 20 - SUBMIT_BURST)
+    finally:
+        for item in data_models.music_playlist.snapshot():
+            if item.username == "importer":
+                data_models.remove_item(item.id)
+
+
+def test_web_import_refuses_oversized_text():
+    response = flask_app.flask_app.test_client().post(
+        "/api/import_playlist",
+        data={"username": "big", "playlist": "x" * (flask_app.IMPORT_MAX_BYTES + 1)},
+        environ_base={"REMOTE_ADDR": "10.9.9.2"},
+    )
+    assert response.status_code == 413
@@ -0,0 +1,45 @@
+import random
+import threading
+
+from data_models import PlaylistQueue, QueueItem
+
+
+def make_item(n, duration=None):
+    return QueueItem(url=f"https://youtu.be/{n:011d}", title=str(n), ip="ip", username="u", duration=duration)
+
+
+def test_queue_matches_a_plain_list_under_random_operations():
+    rng = random.Random(7)
+    queue = PlaylistQueue(threading.RLock(), 240.0)
+    model = []
+    for n in range(3000):
+        op = rng.random()
+        if op < 0.4 or not model:
+            item = make_item(n, rng.choice([None, 60.0, 200.0]))
+            before = rng.choice(model + [None])
+            queue.insert(item, before.id if before else None)
+            model.insert(model.index(before) if before else len(model), item)
+        elif op < 0.6:
+            item = model.pop(rng.randrange(len(model)))
+            assert queue.remove(item.id) is item
+        elif op < 0.8:
+            item = rng.choice(model)
+            before = rng.choice(model + [None])
+            if before is item:
+                continue
+            assert queue.move(item.id, before.id if before else None)
+            model.remove(item)
+            model.insert(model.index(before) if before else len(model), item)
+        else:
+            item = rng.choice(model)
+            item.duration = rng.choice([None, 30.0, 90.0])
+            queue.set_duration(item.id, item.duration)
+
+        assert queue.snapshot() == model
+    ahead = 0.0
+    for position, item in enumerate(model):
+        assert queue.position(item.id) == position
+        assert queue[position] is item
+        assert queue.seconds_before(item.id) == ahead
+        ahead += item.duration or 240.0
+    assert queue.snapshot_with_waits()[0] == model
@@ -0,0 +1,50 @@
+import http.client
+import threading
+
+import pytest
+
+pytest.importorskip("waitress")
+
+import flask_app
+
+THREADS = 4
+
+
+@pytest.fixture
+def server():
+    server = flask_app.make_server(host="127.0.0.1", port=0, threads=THREADS)
+
+    def run():
+        try:
+            server.run()
+        except OSError:
+            # waitress has no stop; closing the socket under its loop ends it
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    yield server.effective_port
+    server.close()
+    flask_app.configure_sse(flask_app.SERVER_THREADS)
+
+
+def open_stream(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", "/api/events")
+    return conn, conn.getresponse()
+
+
+def test_event_streams_leave_threads_for_requests(server):
+    # One stream per worker thread, as with a room full of open pages
+    streams = [open_stream(server) for _ in range(THREADS)]
+    statuses = sorted(response.status for _, response in streams)
+    assert statuses == [200] * int(THREADS * flask_app.SSE_THREAD_SHARE) + [503] * (
+        THREADS - int(THREADS * flask_app.SSE_THREAD_SHARE)
+    )
+
+    conn = http.client.HTTPConnection("127.0.0.1", server, timeout=5)
+    conn.request("GET", "/api/current")
+    assert conn.getresponse().status == 200
+
+    for stream, _ in streams:
+        stream.close()
@@ -0,0 +1,29 @@
+from youtube_url import YouTubeURL, parse_youtube_url
+
+
+def parse(url):
+    return parse_youtube_url.__wrapped__(url)
+
+
+def test_video_ids_from_every_link_shape():
+    for url in (
+        "https://youtu.be/abcdefghijk?si=xyz",
+        "HTTPS://WWW.YOUTUBE.COM/watch?feature=share&v=abcdefghijk",
+        "m.youtube.com/shorts/abcdefghijk/",
+        "https://www.youtube-nocookie.com/embed/abcdefghijk",
+        "https://music.youtube.com/watch?v=bad&v=abcdefghijk",
+    ):
+        assert parse(url) == YouTubeURL("abcdefghijk", None, None), url
+
+
+def test_offsets_and_playlists():
+    assert parse("https://youtube.com/watch?t=1h2m3s&v=abcdefghijk") == YouTubeURL("abcdefghijk", 3723, None)
+    assert parse("https://youtu.be/abcdefghijk?t=x&t=90s") == YouTubeURL("abcdefghijk", 90, None)
+    assert parse("https://youtube.com/embed/abcdefghijk?start=30&list=&list=PL1&list=PL2") == YouTubeURL("abcdefghijk", 30, "PL1")
+    assert parse("https://www.youtube.com/playlist?list=PL1") == YouTubeURL(None, None, "PL1")
+
+
+def test_non_video_links():
+    for url in ("not a link", "https://youtube.community/watch?v=abcdefghijk", "https://www.youtube.com/@band",
+                "https://youtube.com/watch?V=abcdefghijk", "https://youtube.com/v/abcdefghijkl"):
+        assert parse(url) is None, url
@@ -0,0 +1,61 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from data_models import QueueItem, update_item
+from utils import get_cached_metadata, get_youtube_metadata
+
+logger = logging.getLogger(__name__)
+
+RESOLVER_WORKERS = 4
+PENDING_TITLE = "Fetching title..."
+FAILED_TITLE = "Unknown Title"
+
+
+class TitleResolver:
+    """Fills in title and duration of accepted submissions on a background pool."""
+
+    def __init__(self, workers: int = RESOLVER_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resolver")
+
+    def prepare(self, item: QueueItem, keep_title: bool = False) -> QueueItem:
+        """Fill the item from the metadata cache, or mark it pending.
+
+        Call before the item is queued. Returns the item so the caller can
+        queue it straight away.
+        """
+        metadata = get_cached_metadata(item.url)
+        if metadata:
+            if not keep_title:
+                item.title = metadata["title"]
+            item.duration = metadata.get("duration")
+            item.status = "ready"
+        elif not keep_title:
+            item.title = PENDING_TITLE
+            item.status = "pending"
+        return item
+
+    def submit(self, item: QueueItem, keep_title: bool = False):
+        """Resolve the item's metadata in the background if the cache missed"""
+        if item.status == "ready" and item.duration is not None:
+            return None
+        return self.executor.submit(self._resolve, item, keep_title)
+
+    def _resolve(self, item: QueueItem, keep_title: bool):
+        try:
+            metadata = get_youtube_metadata(item.url)
+        except Exception as e:
+            logger.error(f"Resolving {item.url} failed: {e}")
+            metadata = None
+
+        if metadata:
+            fields = {"duration": metadata.get("duration"), "status": "ready"}
+            if not keep_title:
+                fields["title"] = metadata["title"]
+            update_item(item, **fields)
+        elif not keep_title:
+            # Keep the submission so the host can still judge it by its URL
+            update_item(item, title=FAILED_TITLE, status="failed")
+
+
+# Global resolver instance
+title_resolver = TitleResolver()
@@ -1,5 +1,6 @@
 import json
-import datetime
+import math
+import os
 from typing import List, Dict
 
 from textual.app import App, ComposeResult
@@ -16,25 +17,62 @@ from textual.widgets import (
 from textual.containers import Horizontal, Vertical, Container
 from textual.binding import Binding
 from textual import work
+from textual.worker import get_current_worker
 
 from data_models import (
     queue_lock,
-    music_playlist,
     played_history,
     rejected_history,
-    current_video_id,
-    AVERAGE_SONG_DURATION_MIN,
+    queue_with_waits,
     QueueItem,
+    submit_item,
+    play_item,
+    reject_item,
+    move_item_up,
+    move_item_down,
+    changes_since,
+    wait_for_change,
 )
+import data_models
 from utils import (
     is_valid_youtube_url,
-    get_youtube_title,
-    extract_video_id,
-    perform_youtube_search,
+    format_wait,
 )
+from youtube_url import parse_youtube_url
+from title_resolver import title_resolver
+from playlist_import import playlist_importer, ImportJob, EXPORT_FILE
+from search_cache import youtube_search_cache
 from audio_player import audio_player, play_next_in_queue
 
 
+TUI_HISTORY_PAGE_SIZE = 200
+
+QUEUE_COLUMNS = (
+    ("idx", "Idx"),
+    ("title", "Title"),
+    ("user", "User"),
+    ("ip", "IP"),
+    ("url", "URL"),
+    ("wait", "Est. Wait"),
+    ("added", "Added At"),
+)
+PLAYED_COLUMNS = (
+    ("seq", "#"),
+    ("title", "Title"),
+    ("user", "User"),
+    ("url", "URL"),
+    ("processed", "Played At"),
+)
+REJECTED_COLUMNS = (
+    ("seq", "#"),
+    ("title", "Title"),
+    ("user", "User"),
+    ("url", "URL"),
+    ("processed", "Rejected At"),
+    ("reason", "Reason"),
+)
+
+
 # --- Textual TUI App ---
 class MusicQueueApp(App):
     CSS = """
@@ -67,10 +105,16 @@ class MusicQueueApp(App):
         ("d", "delete_item", "Reject Selected"),
         ("space", "play_item", "Play Selected"),
         ("e", "export_playlist", "Export Played"),
+        ("i", "import_playlist", "Import Exported"),
         ("a", "add_from_search", "Add Selected Search Result"),
         ("r", "toggle_autoplay", "Toggle Autoplay"),
+        ("u", "move_up", "Move Up"),
+        ("n", "move_down", "Move Down"),
     ]
 
+    rendered_version = -1
+    rendered_clock = -1
+
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
         yield Label("Queue Management (SPACE to Play, D to Reject):", classes="box")
@@ -91,8 +135,9 @@ class MusicQueueApp(App):
 
         with Container(id="input-container"):
             yield Label("Add Local URL:")
-            yield Input(placeholder="Paste YouTube URL here...", id="url-input")
+            yield Input(placeholder="Paste a YouTube URL, playlist link or playlist file path here...", id="url-input")
             yield Button("Add", id="add-btn", variant="primary")
+            yield Label("", id="import-progress")
 
         yield Footer()
 
@@ -102,76 +147,186 @@ class MusicQueueApp(App):
         # Setup Queue Table
         q_table = self.query_one("#queue-table", DataTable)
         q_table.cursor_type = "row"
-        q_table.add_columns(
-            "Idx", "Title", "User", "IP", "URL", "Est. Wait", "Added At"
-        )
+        for key, label in QUEUE_COLUMNS:
+            q_table.add_column(label, key=key)
 
         # Setup Played Table
         p_table = self.query_one("#played-table", DataTable)
         p_table.cursor_type = "row"
-        p_table.add_columns("Title", "User", "URL", "Played At")
+        for key, label in PLAYED_COLUMNS:
+            p_table.add_column(label, key=key)
 
         # Setup Rejected Table
         r_table = self.query_one("#rejected-table", DataTable)
         r_table.cursor_type = "row"
-        r_table.add_columns("Title", "User", "URL", "Rejected At", "Reason")
+        for key, label in REJECTED_COLUMNS:
+            r_table.add_column(label, key=key)
 
         # Setup Search Results Table
         s_table = self.query_one("#search-results-table", DataTable)
         s_table.cursor_type = "row"
         s_table.add_columns("Title", "Channel", "URL")
 
-        self.set_interval(1.0, self.refresh_tables)
+        # Rendered cell values per row key, used to diff against the new state
+        self.queue_rows: Dict[str, tuple] = {}
+        self.history_items: Dict[str, Dict[int, QueueItem]] = {"played": {}, "rejected": {}}
+        self.history_rows: Dict[str, Dict[str, tuple]] = {"played": {}, "rejected": {}}
+        # History panes materialize only the newest page and load older pages
+        # as the cursor nears the bottom. seen is how much of each history list
+        # has been looked at, oldest the list index of the oldest loaded row.
+        self.history_seen = {"played": 0, "rejected": 0}
+        self.history_oldest = {"played": 0, "rejected": 0}
+
         self.refresh_tables()
+        self.watch_state()
+        # Wait estimates count down with the playing track between state changes
+        self.set_interval(15, self.refresh_tables)
+
+    @work(thread=True, exclusive=True)
+    def watch_state(self) -> None:
+        """Refresh the tables only when the shared state signals a change"""
+        worker = get_current_worker()
+        version = self.rendered_version
+        while not worker.is_cancelled:
+            version = wait_for_change(version, timeout=1.0)
+            if version != self.rendered_version:
+                try:
+                    self.call_from_thread(self.refresh_tables)
+                except RuntimeError:
+                    break  # The app is shutting down
 
     def refresh_tables(self) -> None:
+        # Nothing to redraw unless the shared state moved on or the wait estimates did
+        clock = math.ceil(data_models.playback_remaining() / 60)
+        if data_models.state_version == self.rendered_version and clock == self.rendered_clock:
+            return
+        self.rendered_clock = clock
         with queue_lock:
-            # Refresh Queue
-            q_table = self.query_one("#queue-table", DataTable)
-            self._update_table(q_table, music_playlist, "queue")
-
-            # Refresh Played (Reverse order to show newest first)
-            p_table = self.query_one("#played-table", DataTable)
-            self._update_table(p_table, list(reversed(played_history)), "history")
-
-            # Refresh Rejected
-            r_table = self.query_one("#rejected-table", DataTable)
-            self._update_table(r_table, list(reversed(rejected_history)), "history")
-
-    def _update_table(self, table: DataTable, data: List[QueueItem], type: str):
-        # Determine columns based on type
-        # Ideally we check what columns are added, but we know the structure.
-
-        # Optimization: Only clear/redraw if counts differ or naive check?
-        # For simplicity, we clear and redraw. Textual is fast enough for small lists.
-        cursor_coord = table.cursor_coordinate
-        table.clear()
-
-        for idx, item in enumerate(data):
-            if type == "queue":
-                wait_time = f"{idx * AVERAGE_SONG_DURATION_MIN} mins"
-                table.add_row(
-                    str(idx + 1),
-                    item.title,
-                    item.username,
-                    item.ip,
-                    item.url,
-                    wait_time,
-                    item.added_at,
-                    key=str(idx),  # Key matches current list index
-                )
-            else:  # history types (played and rejected)
-                table.add_row(
-                    item.title,
-                    item.username,
-                    item.url,
-                    item.processed_at or "N/A",
-                    key=str(idx),
-                )
-
-        # Restore cursor if valid
-        if cursor_coord.row < len(data):
-            table.move_cursor(row=cursor_coord.row, column=cursor_coord.column)
+            version, events = changes_since(self.rendered_version)
+            queue_items, waits = queue_with_waits()
+            # Too far behind the change log means reloading the history panes
+            reload = events is None
+            new_played = self._collect_history("played", played_history, reload)
+            new_rejected = self._collect_history("rejected", rejected_history, reload)
+            updated_ids = set() if reload else {e.item_id for e in events if e.kind == "update"}
+        self.rendered_version = version
+
+        # Refresh Queue
+        q_table = self.query_one("#queue-table", DataTable)
+        rows = {}
+        for idx, item in enumerate(queue_items):
+            rows[str(item.id)] = (
+                str(idx + 1),
+                item.title,
+                item.username,
+                item.ip,
+                item.url,
+                format_wait(waits[idx]),
+                item.added_time,
+            )
+        self._sync_rows(q_table, QUEUE_COLUMNS, self.queue_rows, rows, remove_missing=True)
+
+        # Refresh Played and Rejected, newest first
+        for name, new_items in (("played", new_played), ("rejected", new_rejected)):
+            items = self.history_items[name]
+            rendered = self.history_rows[name]
+            if reload:
+                items.clear()
+            rows = {}
+            for item_id in updated_ids:
+                key = str(item_id)
+                if item_id in items:
+                    rows[key] = self._history_row(int(rendered[key][0]), items[item_id], name)
+            self._add_history_rows(name, new_items, rows, remove_missing=reload)
+
+    def _collect_history(self, name: str, history: List[QueueItem], reload: bool) -> list:
+        """Return (seq, item) pairs not shown yet. Caller must hold queue_lock."""
+        total = len(history)
+        if reload:
+            start = max(0, total - TUI_HISTORY_PAGE_SIZE)
+            self.history_oldest[name] = start
+        else:
+            # History lists only grow, so only the tail is new
+            start = self.history_seen[name]
+        self.history_seen[name] = total
+        return list(enumerate(history[start:], start + 1))
+
+    def _add_history_rows(self, name: str, new_items: list, rows: Dict[str, tuple], remove_missing: bool = False) -> None:
+        items = self.history_items[name]
+        for seq, item in new_items:
+            items[item.id] = item
+            rows[str(item.id)] = self._history_row(seq, item, name)
+        self._sync_rows(
+            self.query_one(f"#{name}-table", DataTable),
+            PLAYED_COLUMNS if name == "played" else REJECTED_COLUMNS,
+            self.history_rows[name],
+            rows,
+            remove_missing=remove_missing,
+            reverse=True,
+        )
+
+    def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        table_id = event.data_table.id
+        if table_id not in ("played-table", "rejected-table"):
+            return
+        name = table_id.split("-")[0]
+        oldest = self.history_oldest[name]
+        if oldest == 0 or event.cursor_row < event.data_table.row_count - 5:
+            return
+        # Materialize the next older page as the cursor approaches the end
+        history = played_history if name == "played" else rejected_history
+        with queue_lock:
+            start = max(0, oldest - TUI_HISTORY_PAGE_SIZE)
+            older = list(enumerate(history[start:oldest], start + 1))
+        self.history_oldest[name] = start
+        self._add_history_rows(name, older, {})
+
+    def _history_row(self, seq: int, item: QueueItem, name: str) -> tuple:
+        row = (str(seq), item.title, item.username, item.url, item.processed_time or "N/A")
+        return row + ("",) if name == "rejected" else row
+
+    def _sync_rows(
+        self,
+        table: DataTable,
+        columns,
+        rendered: Dict[str, tuple],
+        rows: Dict[str, tuple],
+        remove_missing: bool,
+        reverse: bool = False,
+    ) -> None:
+        """Add, remove or update only the rows whose values changed.
+
+        rows maps row keys to cell values; the first column holds the display
+        position used to restore ordering. The cursor follows its song, not
+        its index.
+        """
+        cursor_key = None
+        if table.row_count:
+            cursor_key = table.coordinate_to_cell_key(table.cursor_coordinate).row_key
+        cursor_column = table.cursor_coordinate.column
+
+        reorder = False
+        if remove_missing:
+            for key in [key for key in rendered if key not in rows]:
+                table.remove_row(key)
+                del rendered[key]
+        for key, values in rows.items():
+            old = rendered.get(key)
+            if old is None:
+                table.add_row(*values, key=key)
+                reorder = True
+            elif old != values:
+                for (column_key, _), old_value, value in zip(columns, old, values):
+                    if old_value != value:
+                        table.update_cell(key, column_key, value)
+                reorder = reorder or old[0] != values[0]
+            rendered[key] = values
+
+        if reorder:
+            table.sort(columns[0][0], key=int, reverse=reverse)
+
+        if cursor_key is not None and cursor_key.value in rendered:
+            table.move_cursor(row=table.get_row_index(cursor_key), column=cursor_column)
 
     def action_play_item(self) -> None:
         # Only allow actions on the Queue tab
@@ -183,8 +338,7 @@ class MusicQueueApp(App):
             table = self.query_one("#queue-table", DataTable)
             row_key = table.coordinate_to_cell_key(table.cursor_coordinate).row_key
             if row_key:
-                row_index = table.get_row_index(row_key)
-                self.process_item(row_index, "play")
+                self.process_item(int(row_key.value), "play")
         except Exception:
             pass
 
@@ -197,24 +351,37 @@ class MusicQueueApp(App):
             table = self.query_one("#queue-table", DataTable)
             row_key = table.coordinate_to_cell_key(table.cursor_coordinate).row_key
             if row_key:
-                row_index = table.get_row_index(row_key)
-                self.process_item(row_index, "reject")
+                self.process_item(int(row_key.value), "reject")
         except Exception:
             pass
 
-    def process_item(self, index: int, action: str) -> None:
-        global current_video_id
-        with queue_lock:
-            if 0 <= index < len(music_playlist):
-                item = music_playlist.pop(index)
-                item.processed_at = datetime.datetime.now().strftime("%H:%M:%S")
+    def action_move_up(self) -> None:
+        self._move_selected(move_item_up)
+
+    def action_move_down(self) -> None:
+        self._move_selected(move_item_down)
+
+    def _move_selected(self, move) -> None:
+        try:
+            tabbed = self.query_one(TabbedContent)
+            if tabbed.active != "tab-queue":
+                return
+
+            table = self.query_one("#queue-table", DataTable)
+            row_key = table.coordinate_to_cell_key(table.cursor_coordinate).row_key
+            if row_key and move(int(row_key.value)):
+                self.refresh_tables()
+        except Exception:
+            pass
 
-                if action == "play":
-                    played_history.append(item)
+    def process_item(self, item_id: int, action: str) -> None:
+        with queue_lock:
+            if action == "play":
+                item = play_item(item_id)
+                if item:
                     # Play audio instead of updating web player
-                    vid_id = extract_video_id(item.url)
+                    vid_id = item.video_id
                     if vid_id:
-                        current_video_id = vid_id
                         # Play the audio using our new audio player
                         # Use autoplay callback only if autoplay is enabled
                         callback = play_next_in_queue if audio_player.is_autoplay_enabled() else None
@@ -229,11 +396,12 @@ class MusicQueueApp(App):
                         self.notify(
                             f"Could not extract ID for: {item.title}", severity="error"
                         )
-                else:
-                    rejected_history.append(item)
+            else:
+                item = reject_item(item_id)
+                if item:
                     self.notify(f"Rejected: {item.title}")
 
-                self.refresh_tables()
+        self.refresh_tables()
 
     def action_export_playlist(self) -> None:
         with queue_lock:
@@ -257,7 +425,7 @@ class MusicQueueApp(App):
                 })
 
             try:
-                file_name = "played_playlist.json"
+                file_name = EXPORT_FILE
                 with open(file_name, "w", encoding="utf-8") as f:
                     json.dump(export_data, f, indent=4, ensure_ascii=False)
                 self.notify(f"Exported played history to {file_name}", severity="information")
@@ -280,32 +448,84 @@ class MusicQueueApp(App):
         input_widget = self.query_one("#url-input", Input)
         url = input_widget.value.strip()
         if url:
+            parsed = parse_youtube_url(url)
             if is_valid_youtube_url(url):
-                self.notify("Fetching title...", severity="information")
                 input_widget.value = ""  # Clear immediately
-                self.add_url_worker(url)
+                self._add_url(url)
+            elif parsed is not None or os.path.isfile(url):
+                # Playlist links and playlist files go through the bulk import
+                input_widget.value = ""
+                self._import(url)
             else:
                 self.notify("Invalid YouTube URL", severity="error")
 
-    @work(thread=True)
-    def add_url_worker(self, url: str) -> None:
-        title = get_youtube_title(url)
-        self.call_from_thread(self._finish_add_url, url, title)
+    def action_import_playlist(self) -> None:
+        """Queue the songs of the last export again"""
+        if not os.path.isfile(EXPORT_FILE):
+            self.notify(f"No {EXPORT_FILE} to import. Export with E first.", severity="warning")
+            return
+        self._import(EXPORT_FILE)
 
-    def _finish_add_url(self, url: str, title: str) -> None:
-        with queue_lock:
-            item = QueueItem(
-                url=url,
-                title=title,
-                ip="Localhost",
-                username="Host (You)",
-                added_at=datetime.datetime.now().strftime("%H:%M:%S"),
+    def _import(self, source: str) -> None:
+        if os.path.isfile(source):
+            try:
+                with open(source, encoding="utf-8") as f:
+                    text = f.read()
+            except OSError as e:
+                self.notify(f"Error reading {source}: {e}", severity="error")
+                return
+        else:
+            text = source
+        self.notify(f"Importing {source}...", severity="information")
+        playlist_importer.start(
+            text, "Host (You)", "Localhost",
+            on_progress=lambda job: self.call_from_thread(self._show_import_progress, job),
+        )
+
+    def _show_import_progress(self, job: ImportJob) -> None:
+        progress = self.query_one("#import-progress", Label)
+        if job.state == "resolving":
+            progress.update(f"Importing: looked up {job.resolved} / {job.total} songs")
+            return
+        progress.update("")
+        if job.state == "failed":
+            self.notify(f"Import failed: {job.error}", severity="error")
+        else:
+            self.notify(
+                f"Imported {job.added} songs ({job.duplicates} duplicates, {job.skipped} skipped).",
+                severity="information",
             )
-            music_playlist.append(item)
+            self.refresh_tables()
+
+    def _add_url(self, url: str) -> None:
+        # Queue right away; the title resolver fills the row in when it is done
+        item = title_resolver.prepare(QueueItem(
+            url=url,
+            title="",
+            ip="Localhost",
+            username="Host (You)",
+        ))
+        if not self._submit(item):
+            return
+        title_resolver.submit(item)
 
-        self.notify(f"Added '{title}'!")
+        if item.status == "pending":
+            self.notify("Added! Fetching title...", severity="information")
+        else:
+            self.notify(f"Added '{item.title}'!")
         self.refresh_tables()
 
+    def _submit(self, item: QueueItem) -> bool:
+        """Queue item through the duplicate check, telling the host when it was not added"""
+        outcome, existing = submit_item(item)
+        if outcome == "added":
+            return True
+        if outcome == "played":
+            self.notify(f"'{existing.title}' was played recently, not adding it again.", severity="warning")
+        else:
+            self.notify(f"'{existing.title}' is already in the queue.", severity="warning")
+        return False
+
     # --- New TUI Search and Add from Search functionality ---
     def action_search_youtube(self) -> None:
         tabbed = self.query_one(TabbedContent)
@@ -327,7 +547,7 @@ class MusicQueueApp(App):
     @work(thread=True)
     def search_youtube_worker(self, query: str) -> None:
         try:
-            results = perform_youtube_search(query) # Use the shared search function
+            results = youtube_search_cache.search(query) # Shared cached search
             self.call_from_thread(self._display_search_results, results)
         except Exception as e:
             self.call_from_thread(self.notify, f"Error during YouTube search: {e}", severity="error")
@@ -362,15 +582,18 @@ class MusicQueueApp(App):
             title = row_data[0] # Title is the first column
             url = row_data[2]   # URL is the third column
 
-            with queue_lock:
-                item = QueueItem(
+            item = title_resolver.prepare(
+                QueueItem(
                     url=url,
                     title=title,
                     ip="Localhost (TUI Search)",
                     username="Host (You)",
-                    added_at=datetime.datetime.now().strftime("%H:%M:%S"),
-                )
-                music_playlist.append(item)
+                ),
+                keep_title=True,
+            )
+            if not self._submit(item):
+                return
+            title_resolver.submit(item, keep_title=True)
             self.notify(f"Added '{title}' from search to queue!", severity="success")
             self.refresh_tables() # Refresh all tables to show new item in queue
 
@@ -1,107 +1,269 @@
 import re
+import html
 import requests
-import json
 from bs4 import BeautifulSoup
 from typing import List, Dict
 
+import http_client
+from yt_initial_data import (
+    parse_search_page,
+    parse_search_continuation,
+    extract_innertube_config,
+)
+from metadata_cache import metadata_cache
+from youtube_url import parse_youtube_url
+
 
 def is_valid_youtube_url(url):
-    youtube_regex = (
-        r"(https?://)?(www\.)?"
-        r"(youtube|youtu|youtube-nocookie)\.(com|be)/"
-        r"(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})"
+    """True if url links to a YouTube video"""
+    parsed = parse_youtube_url(url)
+    return parsed is not None and parsed.video_id is not None
+
+
+def format_wait(seconds: float) -> str:
+    """Human readable wait estimate, e.g. '12 mins'"""
+    return f"{round(seconds / 60)} mins"
+
+
+def parse_iso_duration(value):
+    """Converts an ISO 8601 duration such as 'PT4M13S' to seconds."""
+    match = re.match(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?", value or "")
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes, seconds = (int(g) if g else 0 for g in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+# "fast" streams the page and scans it with precompiled patterns, stopping as
+# soon as the metadata is found; "full" parses the whole page with BeautifulSoup.
+METADATA_FETCH_MODE = "fast"
+METADATA_CHUNK_SIZE = 16 * 1024
+METADATA_MAX_BYTES = 512 * 1024  # Give up scanning and fall back after this much
+
+
+def _meta_pattern(tag, attr, name):
+    # Matches <tag attr="name" content="..."> with either attribute order
+    return re.compile(
+        rb'<' + tag + rb'\s[^>]*?(?:'
+        + attr + rb'="' + name + rb'"[^>]*?content="([^"]*)"'
+        + rb'|content="([^"]*)"[^>]*?' + attr + rb'="' + name + rb'")'
     )
-    return re.match(youtube_regex, url) is not None
 
 
-def get_youtube_title(url):
+# Same tags as fetch_youtube_metadata_full looks up. The channel is the author
+# <link>; <meta itemprop="name"> earlier in the page holds the video title.
+METADATA_PATTERNS = {
+    "title": _meta_pattern(rb"meta", rb"property", rb"og:title"),
+    "thumbnail": _meta_pattern(rb"meta", rb"property", rb"og:image"),
+    "duration": _meta_pattern(rb"meta", rb"itemprop", rb"duration"),
+    "channel": _meta_pattern(rb"link", rb"itemprop", rb"name"),
+}
+TITLE_TAG_PATTERN = re.compile(rb"<title>([^<]*)</title>")
+HEAD_END_MARKER = b"</head>"
+
+
+def scan_metadata(page, start=0, metadata=None):
+    """Pulls metadata fields out of raw page bytes with the precompiled patterns.
+
+    Only fields missing from metadata are searched for, starting at offset start,
+    so a streamed page can be scanned chunk by chunk without rescanning.
+    """
+    metadata = {} if metadata is None else metadata
+    for field, pattern in METADATA_PATTERNS.items():
+        if field in metadata:
+            continue
+        match = pattern.search(page, start)
+        if match:
+            value = html.unescape((match.group(1) or match.group(2)).decode("utf-8", "replace"))
+            metadata[field] = parse_iso_duration(value) if field == "duration" else value
+    return metadata
+
+
+def scan_title_tag(page):
+    match = TITLE_TAG_PATTERN.search(page)
+    if match:
+        title = html.unescape(match.group(1).decode("utf-8", "replace")).replace(" - YouTube", "")
+        if title and title != "YouTube":
+            return title
+    return None
+
+
+def fetch_youtube_metadata_fast(url):
+    """Streams the watch page and stops reading once the metadata is found."""
+    page = bytearray()
+    metadata = {}
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=5)
+        with http_client.get(url, timeout=5, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            for chunk in response.iter_content(METADATA_CHUNK_SIZE):
+                # Overlap the previous chunk so a tag split across chunks still matches
+                start = max(0, len(page) - 1024)
+                page += chunk
+                scan_metadata(page, start, metadata)
+                if len(metadata) == len(METADATA_PATTERNS):
+                    break
+                if "title" in metadata and page.find(HEAD_END_MARKER, start) != -1:
+                    break
+                if len(page) >= METADATA_MAX_BYTES:
+                    break
+    except Exception as e:
+        print(f"Error fetching title: {e}")
+    title = metadata.get("title") or scan_title_tag(page)
+    if not title:
+        return None
+    return {
+        "title": title,
+        "channel": metadata.get("channel"),
+        "duration": metadata.get("duration"),
+        "thumbnail": metadata.get("thumbnail"),
+    }
+
+
+def fetch_oembed_metadata(url):
+    """Fetches title, channel and thumbnail from YouTube's small oEmbed JSON endpoint."""
+    try:
+        response = http_client.get(
+            "https://www.youtube.com/oembed",
+            params={"url": url, "format": "json"},
+            timeout=5,
+        )
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("title"):
+                return {
+                    "title": data["title"],
+                    "channel": data.get("author_name"),
+                    "duration": None,
+                    "thumbnail": data.get("thumbnail_url"),
+                }
+    except Exception as e:
+        print(f"Error fetching oEmbed metadata: {e}")
+    return None
+
+
+def fetch_ytdlp_metadata(url):
+    """Last resort: asks yt-dlp for the video info without downloading."""
+    try:
+        import yt_dlp
+
+        with yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True}) as ydl:
+            info = ydl.extract_info(url, download=False)
+        if info.get("title"):
+            return {
+                "title": info["title"],
+                "channel": info.get("channel") or info.get("uploader"),
+                "duration": info.get("duration"),
+                "thumbnail": info.get("thumbnail"),
+            }
+    except Exception as e:
+        print(f"Error fetching yt-dlp metadata: {e}")
+    return None
+
+
+def fetch_youtube_metadata(url):
+    """Fetches title, channel, duration and thumbnail using the configured mode."""
+    if METADATA_FETCH_MODE == "full":
+        return fetch_youtube_metadata_full(url)
+    return (
+        fetch_youtube_metadata_fast(url)
+        or fetch_oembed_metadata(url)
+        or fetch_ytdlp_metadata(url)
+    )
+
+
+def fetch_youtube_metadata_full(url):
+    """Downloads the watch page and returns title, channel, duration and thumbnail."""
+    try:
+        response = http_client.get(url, timeout=5)
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, "html.parser")
+            title = None
             meta_title = soup.find("meta", property="og:title")
             if meta_title:
-                return str(meta_title["content"])
-            if soup.title and soup.title.string:
-                return str(soup.title.string).replace(" - YouTube", "")
+                title = str(meta_title["content"])
+            elif soup.title and soup.title.string:
+                title = str(soup.title.string).replace(" - YouTube", "")
+            if title:
+                channel = soup.find("link", itemprop="name")
+                duration = soup.find("meta", itemprop="duration")
+                thumbnail = soup.find("meta", property="og:image")
+                return {
+                    "title": title,
+                    "channel": str(channel["content"]) if channel else None,
+                    "duration": parse_iso_duration(duration["content"]) if duration else None,
+                    "thumbnail": str(thumbnail["content"]) if thumbnail else None,
+                }
     except Exception as e:
         print(f"Error fetching title: {e}")
-    return "Unknown Title"
+    return None
+
+
+def get_youtube_metadata(url):
+    """Returns cached metadata for a YouTube URL, fetching it on a cache miss."""
+    video_id = extract_video_id(url)
+    if video_id:
+        cached = metadata_cache.get(video_id)
+        if cached:
+            return cached
+    metadata = fetch_youtube_metadata(url)
+    if metadata and video_id:
+        metadata_cache.put(video_id, metadata)
+    return metadata
+
+
+def get_cached_metadata(url):
+    """Returns metadata only if it is already cached, never touching the network."""
+    video_id = extract_video_id(url)
+    return metadata_cache.get(video_id) if video_id else None
 
 
 def extract_video_id(url):
     """Extracts the video ID from a YouTube URL."""
-    youtube_regex = (
-        r"(https?://)?(www\.)?"
-        r"(youtube|youtu|youtube-nocookie)\.(com|be)/"
-        r"(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})"
-    )
-    match = re.match(youtube_regex, url)
-    if match:
-        return match.group(6)
-    return None
+    parsed = parse_youtube_url(url)
+    return parsed.video_id if parsed else None
+
 
+SEARCH_RESULT_LIMIT = 10
+SEARCH_CONTINUATION_URL = "https://www.youtube.com/youtubei/v1/search"
 
-def perform_youtube_search(query: str) -> List[Dict[str, str]]:
-    """Performs a YouTube search and returns a list of video titles, URLs, and thumbnails."""
+
+def perform_youtube_search(query: str, max_results: int = SEARCH_RESULT_LIMIT) -> List[Dict[str, str]]:
+    """Performs a YouTube search and returns a list of video titles, URLs, and thumbnails.
+
+    Results beyond the first page are fetched with continuation tokens until
+    max_results is reached or YouTube runs out of results.
+    """
     search_url = f"https://www.youtube.com/results?search_query={requests.utils.quote(query)}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
     results = []
     try:
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = http_client.get(search_url, timeout=10)
         response.raise_for_status() # Raise an exception for HTTP errors
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        # YouTube's internal JSON layout can change, making scraping fragile.
+        page = response.text
+        results, continuation = parse_search_page(page)
 
-        # YouTube's HTML structure can change, making scraping fragile.
-        # This attempts to find video results.
-        # Look for script tags containing 'var ytInitialData'
-        script_tags = soup.find_all('script')
-        yt_initial_data = None
-        for script in script_tags:
-            if 'var ytInitialData' in str(script):
-                yt_initial_data = script
+        api_key, client_version = extract_innertube_config(page)
+        while continuation and len(results) < max_results and api_key and client_version:
+            response = http_client.post(
+                SEARCH_CONTINUATION_URL,
+                params={"key": api_key},
+                json={
+                    "context": {"client": {"clientName": "WEB", "clientVersion": client_version}},
+                    "continuation": continuation,
+                },
+                timeout=10,
+            )
+            response.raise_for_status()
+            more, continuation = parse_search_continuation(response.json())
+            if not more:
                 break
+            results.extend(more)
 
-        if yt_initial_data:
-            # Extract JSON string from the script tag
-            json_str = str(yt_initial_data).split('var ytInitialData = ')[1].split(';</script>')[0]
-            data = json.loads(json_str)
-
-            # Navigate through the JSON structure to find video results
-            # This path is highly dependent on YouTube's internal API and can break.
-            contents = data.get('contents', {}).get('twoColumnSearchResultsRenderer', {}).get('primaryContents', {}).get('sectionListRenderer', {}).get('contents', [])
-            
-            for section in contents:
-                if 'itemSectionRenderer' in section:
-                    for item in section['itemSectionRenderer'].get('contents', []):
-                        if 'videoRenderer' in item:
-                            video = item['videoRenderer']
-                            video_id = video.get('videoId')
-                            title = video.get('title', {}).get('runs', [{}])[0].get('text')
-                            channel = video.get('ownerText', {}).get('runs', [{}])[0].get('text')
-                            thumbnail_url = video.get('thumbnail', {}).get('thumbnails', [{}])[-1].get('url') # Get highest quality thumbnail
-
-                            if video_id and title:
-                                results.append({
-                                    "title": title,
-                                    "channel": channel,
-                                    "url": f"https://www.youtube.com/watch?v={video_id}",
-                                    "thumbnail": thumbnail_url
-                                })
-                                if len(results) >= 10: # Limit results
-                                    break
-                    if len(results) >= 10:
-                        break
-        
     except requests.exceptions.RequestException as e:
         print(f"Network error during YouTube search: {e}")
     except Exception as e:
         print(f"Error parsing YouTube search results: {e}")
     
-    return results
+    return results[:max_results]
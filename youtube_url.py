@@ -0,0 +1,58 @@
+"""Parses every YouTube link shape guests paste into one structured result.
+
+Covers youtube.com (www, m and music hosts), youtube-nocookie.com and
+youtu.be, with watch?v=, embed/, v/, shorts/ and live/ paths, playlist
+links and t= / start= offsets, all read by a single compiled pattern.
+Results are also memoized, since the same links are parsed over and over.
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+URL_CACHE_SIZE = 4096
+
+_ID = r"[A-Za-z0-9_-]{11}"
+_PARAM_END = r"(?=[&#]|$)"
+
+# One left-to-right pass over the link: the host, a video ID in the path, then
+# the query parameter by parameter. A conditional such as (?(3)(?!)|...) skips
+# a parameter once its group (v is group 3, t group 4, list group 8) has been
+# found, so the first valid v=, t= / start= and list= win, as with a loop.
+_url_pattern = re.compile(
+    r"(?i:(?:https?://)?(?:(?:www|m|music)\.)?(?:(?P<short>youtu\.be)|youtube(?:-nocookie)?\.com))"
+    r"(?:/(?:(?(short)|(?:embed|v|shorts|live|e)/)(?P<path_id>" + _ID + r")(?=[/?#]|$))?[^?#]*)?"
+    r"(?:[?&#](?:"
+    r"(?(3)(?!)|v=(?P<v>" + _ID + r")" + _PARAM_END + r")"
+    r"|(?(4)(?!)|(?:t|start)=(?P<t>(?=\d)(?:(?P<hours>\d+)h)?(?:(?P<minutes>\d+)m)?(?:(?P<seconds>\d+)s?)?)"
+    + _PARAM_END + r")"
+    r"|(?(8)(?!)|list=(?P<list>[^&#]+))"
+    r"|[^&#]*"
+    r"))*$"
+)
+
+
+class YouTubeURL(NamedTuple):
+    video_id: Optional[str]
+    start_time: Optional[int]  # Seconds into the video
+    playlist_id: Optional[str]
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def parse_youtube_url(url: str) -> Optional[YouTubeURL]:
+    """Return the video ID, start time and playlist ID of a YouTube link.
+
+    None means the link is not a YouTube link at all; playlist links without
+    a video come back with video_id None.
+    """
+    match = _url_pattern.match(url.strip())
+    if match is None:
+        return None
+    _, path_id, query_id, _, hours, minutes, seconds, playlist_id = match.groups()
+    video_id = path_id or query_id
+    if video_id is None and playlist_id is None:
+        return None
+    start_time = None
+    if hours or minutes or seconds:
+        start_time = int(hours or 0) * 3600 + int(minutes or 0) * 60 + int(seconds or 0)
+    # _make skips the keyword handling of the generated __new__, a large share of a parse
+    return YouTubeURL._make((video_id, start_time, playlist_id))
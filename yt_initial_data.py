@@ -0,0 +1,100 @@
+"""Extracts pieces of YouTube's embedded ytInitialData without building a DOM.
+
+The results page embeds a multi-megabyte JSON blob in a <script> tag. Instead
+of parsing the HTML and decoding the whole blob, these helpers find the blob
+with a single substring search and decode only the subtree that is needed.
+"""
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+INITIAL_DATA_MARKERS = ('var ytInitialData = ', 'window["ytInitialData"] = ')
+INNERTUBE_API_KEY_PATTERN = re.compile(r'"INNERTUBE_API_KEY":\s*"([^"]+)"')
+INNERTUBE_CLIENT_VERSION_PATTERN = re.compile(r'"INNERTUBE_CONTEXT_CLIENT_VERSION":\s*"([^"]+)"')
+
+_decoder = json.JSONDecoder()
+
+
+def find_initial_data(page: str) -> int:
+    """Returns the offset of the ytInitialData object in page, or -1."""
+    for marker in INITIAL_DATA_MARKERS:
+        index = page.find(marker)
+        if index != -1:
+            return index + len(marker)
+    return -1
+
+
+def extract_subtree(page: str, key: str, start: int = 0) -> Optional[dict]:
+    """Decodes only the JSON object stored under key, searching from start."""
+    index = page.find(f'"{key}":', start)
+    if index == -1:
+        return None
+    brace = page.find("{", index + len(key) + 3)
+    if brace == -1:
+        return None
+    try:
+        value, _ = _decoder.raw_decode(page, brace)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def extract_innertube_config(page: str) -> Tuple[Optional[str], Optional[str]]:
+    """Returns the (api_key, client_version) needed to request continuation pages."""
+    api_key = INNERTUBE_API_KEY_PATTERN.search(page)
+    client_version = INNERTUBE_CLIENT_VERSION_PATTERN.search(page)
+    return (
+        api_key.group(1) if api_key else None,
+        client_version.group(1) if client_version else None,
+    )
+
+
+def parse_search_items(sections: List[dict]) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """Turns search section renderers into results plus the next continuation token."""
+    results = []
+    continuation = None
+    for section in sections:
+        if 'itemSectionRenderer' in section:
+            for item in section['itemSectionRenderer'].get('contents', []):
+                if 'videoRenderer' not in item:
+                    continue
+                video = item['videoRenderer']
+                video_id = video.get('videoId')
+                title = video.get('title', {}).get('runs', [{}])[0].get('text')
+                channel = video.get('ownerText', {}).get('runs', [{}])[0].get('text')
+                thumbnail_url = video.get('thumbnail', {}).get('thumbnails', [{}])[-1].get('url')  # Highest quality
+                if video_id and title:
+                    results.append({
+                        "title": title,
+                        "channel": channel,
+                        "url": f"https://www.youtube.com/watch?v={video_id}",
+                        "thumbnail": thumbnail_url,
+                    })
+        elif 'continuationItemRenderer' in section:
+            continuation = (
+                section['continuationItemRenderer']
+                .get('continuationEndpoint', {})
+                .get('continuationCommand', {})
+                .get('token')
+            )
+    return results, continuation
+
+
+def parse_search_page(page: str) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """Extracts first-page search results and the continuation token from raw HTML."""
+    start = find_initial_data(page)
+    if start == -1:
+        return [], None
+    renderer = extract_subtree(page, 'twoColumnSearchResultsRenderer', start)
+    if renderer is None:
+        return [], None
+    sections = renderer.get('primaryContents', {}).get('sectionListRenderer', {}).get('contents', [])
+    return parse_search_items(sections)
+
+
+def parse_search_continuation(data: dict) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """Extracts results from a youtubei/v1/search continuation response."""
+    sections = []
+    for command in data.get('onResponseReceivedCommands', []):
+        sections.extend(command.get('appendContinuationItemsAction', {}).get('continuationItems', []))
+    return parse_search_items(sections)